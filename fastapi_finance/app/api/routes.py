@@ -1,11 +1,17 @@
 from bson import ObjectId
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
 from app.db.database import Database
 from app.dependencies.db_dep import get_db
+from app.dependencies.filters_dep import get_transactions_filter
+from app.dependencies.validation_pool_dep import get_validation_pool, get_validation_pool_size
 from app.decorators import show_execution_time
 from app.api.responses import Count, CreateManyTransactions
-from app.services.category_service import create_categories_map
-from app.services.csv_service import prepare_transactions_from_csv
-from fastapi import APIRouter, status, UploadFile, File, Depends, HTTPException
+from app.services.import_service import import_transactions_csv
+from app.services.report_service import get_report_file
+from fastapi import APIRouter, status, UploadFile, File, Depends, HTTPException, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from app.utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor
 from app.schema.transaction import (
   TransactionInDB,
   TransactionCreate,
@@ -19,9 +25,10 @@ from app.services.transaction_service import (
   delete_transaction,
   get_all_transactions,
   delete_all_transactions,
-  create_many_transactions,
-  serialize_object_id_if_any,
   get_all_transactions_count,
+  stream_transactions,
+  DEFAULT_PAGE_SIZE,
+  MAX_PAGE_SIZE,
 )
 
 
@@ -29,19 +36,55 @@ router = APIRouter()
 
 @router.get("/", response_model=list[TransactionInDB])
 @show_execution_time
-async def route_get_transactions(db: Database = Depends(get_db)):
-  """Return all transactions from MongoDB."""
-  return await get_all_transactions(db)
+async def route_get_transactions(
+  response: Response,
+  limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+  cursor: Optional[str] = None,
+  query: dict = Depends(get_transactions_filter),
+  db: Database = Depends(get_db),
+):
+  """Return page of transactions from MongoDB (optionally filtered). When there can be more of
+  them then the token for getting the next page (`cursor`) is returned in `X-Next-Cursor` header.
+  The same filters have to be passed with the token."""
+  transactions = await get_all_transactions(db, limit, decode_cursor(cursor), query)
+  if len(transactions) == limit:
+    last = transactions[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.ownerId, last.date, last.id)
+  return transactions
+
+
+# it has to be defined before "/{id}" so "stream" is not treated as an id
+@router.get("/stream")
+async def route_stream_transactions(
+  cursor: Optional[str] = None,
+  query: dict = Depends(get_transactions_filter),
+  db: Database = Depends(get_db),
+):
+  """Return all (optionally filtered) transactions (after `cursor` if given) as NDJSON - one
+  transaction per line."""
+  return StreamingResponse(
+    stream_transactions(db, decode_cursor(cursor), query),
+    media_type="application/x-ndjson",
+  )
 
 
 @router.get("/count", response_model=Count)
 @show_execution_time
-async def route_get_transactions_count(db: Database = Depends(get_db)):
-  """Return number of all transactions stored in MongoDB."""
-  count = await get_all_transactions_count(db)
+async def route_get_transactions_count(
+  query: dict = Depends(get_transactions_filter),
+  db: Database = Depends(get_db),
+):
+  """Return number of all (optionally filtered) transactions stored in MongoDB."""
+  count = await get_all_transactions_count(db, query)
   return { "count": count }
 
 
+@router.get("/import-reports/{report_id}")
+async def route_get_import_report(report_id: str):
+  """Return all errors of rejected CSV import (one error per line)."""
+  return FileResponse(get_report_file(report_id), media_type="application/x-ndjson")
+
+
 @router.get("/{id}", response_model=TransactionInDB)
 @show_execution_time
 async def route_get_transaction(id: str, db: Database = Depends(get_db)):
@@ -105,33 +148,20 @@ async def route_delete_all_transactions(db: Database = Depends(get_db)):
 async def route_import_transactions_csv(
   id: str,
   db: Database = Depends(get_db),
+  pool: Optional[ProcessPoolExecutor] = Depends(get_validation_pool),
+  pool_size: int = Depends(get_validation_pool_size),
   file: UploadFile = File(...),
 ):
-  """Create transactions based on the data in CSV"""
+  """Create transactions based on the data in CSV (all of them or none when any is invalid)"""
 
   if (await db.users.find_one({"_id": ObjectId(id)})) is None:
     raise HTTPException(status_code=404, detail="User not found")
 
   # do not allow importing transactions' data from CSV for a user who already has transactions
-  if (await db.transactions.count_documents({ "ownerId": ObjectId(id)})) > 0:
+  if (await db.transactions.find_one({ "ownerId": ObjectId(id) }, projection={ "_id": 1 })):
     raise HTTPException(
       status_code=409,
       detail="Cannot import transactions for a user who already has some transactions",
     )
 
-  valid_docs, errors = await prepare_transactions_from_csv(file, id)
-
-  categories_map = await create_categories_map(db, id, valid_docs)
-
-  if (errors):
-    errors_to_show = list(map(serialize_object_id_if_any, errors[:10]))
-    raise HTTPException(
-      status_code=400,
-      detail={
-        "valid_transactions_count": len(valid_docs),
-        "invalid_transactions_count": len(errors),
-        "first_10_errors": errors_to_show,
-      }
-    )
-  
-  return await create_many_transactions(db, valid_docs, errors, categories_map)
+  return await import_transactions_csv(db, file, id, pool, pool_size)
@@ -1,9 +1,19 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 
 class Settings(BaseSettings):
   MONGO_URI: str
   MONGO_DB: str
+  # `vocabulary.json` generated by the parser with known values of selector fields
+  VOCABULARY_FILE: Optional[str] = None
+  # directory for reports with all errors of rejected CSV imports
+  IMPORT_REPORTS_DIR: str = "import-reports"
+  # reports older than that are removed
+  IMPORT_REPORTS_RETENTION_DAYS: int = 7
+  # number of processes validating rows of imported CSV files (all CPUs when not set) - with 0
+  # rows are validated in a thread of the server process
+  IMPORT_VALIDATION_WORKERS: Optional[int] = None
 
   model_config = ConfigDict(env_file=".env")
 
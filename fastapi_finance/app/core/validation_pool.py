@@ -0,0 +1,42 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from app.core.config import settings
+from app.utils.mongodb_fastapi import MongoDBFastAPI
+
+
+# workers are started by a separate server process instead of being forked from the server
+# process, which has running threads (event loop, Motor, executors); modules needed for the
+# validation are imported there once
+VALIDATION_START_METHOD = "forkserver"
+VALIDATION_MODULES = ["app.services.csv_service"]
+
+
+def get_validation_workers() -> int:
+  if settings.IMPORT_VALIDATION_WORKERS is None:
+    return os.cpu_count() or 1
+  return settings.IMPORT_VALIDATION_WORKERS
+
+
+def init_validation_pool(app: MongoDBFastAPI):
+  """Attach pool of processes validating imported transactions to the FastAPI app. All processes
+  are started here (at startup) - otherwise they would be started by the first import and block
+  the event loop."""
+  workers = get_validation_workers()
+  if workers > 0:
+    context = multiprocessing.get_context(VALIDATION_START_METHOD)
+    context.set_forkserver_preload(VALIDATION_MODULES)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    for future in [pool.submit(os.getpid) for _ in range(workers)]:
+      future.result()
+    app.validation_pool = pool
+    app.validation_pool_size = workers
+  logging.getLogger("app").info(f"Validation of imported transactions in {workers} processes")
+
+
+def close_validation_pool(app: MongoDBFastAPI):
+  if app.validation_pool is not None:
+    app.validation_pool.shutdown(cancel_futures=True)
+    app.validation_pool = None
+    app.validation_pool_size = 0
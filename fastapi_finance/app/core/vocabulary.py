@@ -0,0 +1,52 @@
+import sys
+import json
+import logging
+from pathlib import Path
+from typing import Optional
+from pydantic import BaseModel
+from app.core.config import settings
+
+
+# version of the vocabulary file generated by the parser which is supported here
+VOCABULARY_VERSION = 1
+
+
+class Vocabulary(BaseModel):
+  """Known values of selector fields (generated by the parser from its maps)."""
+  version: int
+  hash: str
+  values: dict[str, frozenset[str]]
+  system_categories: frozenset[str]
+
+  def get(self, field: str, value: str) -> Optional[str]:
+    """Return interned value when it is known for the field, otherwise None."""
+    if value in self.values.get(field, ()):
+      return sys.intern(value)
+    return None
+
+
+def load_vocabulary(path: Optional[str]) -> Optional[Vocabulary]:
+  if path is None:
+    return None
+
+  data = json.loads(Path(path).read_text(encoding="utf-8"))
+  if data.get("version") != VOCABULARY_VERSION:
+    raise ValueError(
+      f"Vocabulary version {data.get('version')} is not supported (expected {VOCABULARY_VERSION})"
+    )
+
+  vocabulary = Vocabulary(
+    version=data["version"],
+    hash=data["hash"],
+    values={
+      field: frozenset(sys.intern(value) for value in values)
+      for field, values in data["values"].items()
+    },
+    system_categories=frozenset(data["system_categories"]),
+  )
+  logging.getLogger("app").info(f"Loaded vocabulary [{vocabulary.hash[:12]}]")
+  return vocabulary
+
+
+# loaded once when the app starts - without the file any values of selector fields are accepted
+vocabulary = load_vocabulary(settings.VOCABULARY_FILE)
@@ -0,0 +1,41 @@
+import logging
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from app.db.database import Database
+
+
+# indexes of collections which are created (if missing) when the app starts; every query used
+# by the services should be backed by one of them (compound indexes also serve their prefixes)
+INDEXES = {
+  "transactions": [
+    # listing and filtering of transactions of the owner (also keyset pagination - `_id` at the end
+    # keeps the order of transactions with the same date) and existence checks by `ownerId`
+    IndexModel([("ownerId", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)]),
+    # max `sourceIndex` of the owner (counter) and references between imported transactions
+    IndexModel([("ownerId", ASCENDING), ("sourceIndex", ASCENDING)]),
+    IndexModel([("categoryId", ASCENDING)]),
+  ],
+  "categories": [
+    IndexModel([("nameNormalized", ASCENDING), ("ownerId", ASCENDING), ("type", ASCENDING)]),
+  ],
+}
+
+# errors of creating an index which already exists with other name or options
+INDEX_CONFLICT_CODES = {85, 86}  # IndexOptionsConflict, IndexKeySpecsConflict
+
+
+async def ensure_indexes(db: Database):
+  """Create indexes declared in `INDEXES` which do not exist yet (existing ones are kept - also
+  when they have the same keys but e.g. other names)."""
+  logger = logging.getLogger("app")
+  for collection_name, indexes in INDEXES.items():
+    collection = getattr(db, collection_name)
+    # one by one so a conflict of one index does not stop creating the others
+    for index in indexes:
+      try:
+        await collection.create_indexes([index])
+      except OperationFailure as e:
+        if e.code not in INDEX_CONFLICT_CODES:
+          raise
+        logger.warning(f"Index {index.document['key']} of '{collection_name}' exists: {e}")
+    logger.info(f"Ensured indexes of '{collection_name}'")
@@ -0,0 +1,44 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import date, datetime, time, timedelta
+from typing import Optional
+from fastapi import Query, status
+from app.api.errors import AppError
+
+
+def to_object_id(value: str, name: str) -> ObjectId:
+  try:
+    return ObjectId(value)
+  except (InvalidId, TypeError):
+    raise AppError(status.HTTP_400_BAD_REQUEST, f"Invalid '{name}': '{value}'")
+
+
+async def get_transactions_filter(
+  owner_id: Optional[str] = Query(None, alias="ownerId"),
+  date_from: Optional[date] = Query(None, alias="dateFrom"),
+  date_to: Optional[date] = Query(None, alias="dateTo"),
+  category_id: Optional[str] = Query(None, alias="categoryId"),
+  account: Optional[str] = None,
+  transaction_type: Optional[str] = Query(None, alias="transactionType"),
+  currency: Optional[str] = None,
+) -> dict:
+  """Return MongoDB filter of transactions based on query parameters. Dates are days and both of
+  them are inclusive (transactions from any time of `dateTo` are included)."""
+  query = {}
+  if owner_id is not None:
+    query["ownerId"] = to_object_id(owner_id, "ownerId")
+  if date_from is not None or date_to is not None:
+    query["date"] = {}
+    if date_from is not None:
+      query["date"]["$gte"] = datetime.combine(date_from, time.min)
+    if date_to is not None:
+      query["date"]["$lt"] = datetime.combine(date_to + timedelta(days=1), time.min)
+  if category_id is not None:
+    query["categoryId"] = to_object_id(category_id, "categoryId")
+  if account is not None:
+    query["account"] = account
+  if transaction_type is not None:
+    query["transactionType"] = transaction_type
+  if currency is not None:
+    query["currency"] = currency
+  return query
@@ -0,0 +1,11 @@
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from app.utils.mongodb_request import MongoDBRequest
+
+
+async def get_validation_pool(request: MongoDBRequest) -> Optional[ProcessPoolExecutor]:
+  return request.app.validation_pool
+
+
+async def get_validation_pool_size(request: MongoDBRequest) -> int:
+  return request.app.validation_pool_size
@@ -1,6 +1,9 @@
 from contextlib import asynccontextmanager
 from app.api.routes import router as api_router
 from app.db.client import init_db, close_db
+from app.db.database import Database
+from app.db.indexes import ensure_indexes
+from app.core.validation_pool import init_validation_pool, close_validation_pool
 from app.utils.mongodb_fastapi import MongoDBFastAPI
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -16,10 +19,13 @@ from app.middleware.performance import add_execution_time
 async def lifespan(app: MongoDBFastAPI):
   # --- Startup ---
   await init_db(app)
+  await ensure_indexes(Database(app.mongodb))
+  init_validation_pool(app)
 
   yield # app runs here
 
   # --- Shutdown ---
+  close_validation_pool(app)
   close_db(app)
 
 
@@ -11,6 +11,7 @@ from pydantic_core import PydanticCustomError
 from datetime import datetime, timezone
 from typing import Optional
 from bson import ObjectId
+from app.core.vocabulary import vocabulary
 
 
 class TransactionBase(BaseModel):
@@ -46,7 +47,7 @@ class TransactionBase(BaseModel):
         "Amount must be greater than zero"
       )
     return value
-  
+
   model_config = ConfigDict(
     populate_by_name=True,
     json_encoders={ ObjectId: str },
@@ -56,6 +57,25 @@ class TransactionBase(BaseModel):
 
 class TransactionCreate(TransactionBase, PartialModelMixin):
   """Schema for creating a new transaction."""
+  # only written values are checked - stored transactions are loaded even when the vocabulary
+  # does not know some of their values (e.g. they were saved before it was changed)
+  @field_validator(
+    "currency", "payment_method", "account", "currencies", "transaction_type"
+  )
+  @classmethod
+  def value_must_be_known(cls, value, info):
+    if vocabulary is None or value is None:
+      return value
+
+    known_value = vocabulary.get(info.field_name, value)
+    if known_value is None:
+      raise PydanticCustomError(
+        "unknown_value",
+        "Value '{value}' is not known for '{field}'",
+        { "value": value, "field": info.field_name },
+      )
+    return known_value
+
   @model_validator(mode="after")
   def validate_other_currency_transaction(self):
 
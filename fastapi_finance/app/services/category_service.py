@@ -1,21 +1,71 @@
 import re
 from bson import ObjectId
+from typing import Iterable
+from collections import OrderedDict
 from fastapi import HTTPException
 from app.db.database import Database
 from app.schema.transaction import TransactionCreate
 
 
+# number of owners whose categories are cached (categories of the least recently used owners
+# are evicted)
+CATEGORIES_CACHE_SIZE = 256
+
+
+class CategoriesCache:
+  """IDs of categories (by normalized names) available for owners - their user categories and
+  system ones. It is kept in memory of the process, so every write of categories has to
+  invalidate it."""
+  def __init__(self, max_size: int = CATEGORIES_CACHE_SIZE):
+    self.max_size = max_size
+    self._owners: OrderedDict[ObjectId, dict[str, ObjectId]] = OrderedDict()
+
+  def get(self, owner_id: ObjectId) -> dict[str, ObjectId]:
+    ids = self._owners.get(owner_id)
+    if ids is None:
+      return {}
+    self._owners.move_to_end(owner_id)
+    return ids
+
+  def update(self, owner_id: ObjectId, ids: dict[str, ObjectId]):
+    self._owners.setdefault(owner_id, {}).update(ids)
+    self._owners.move_to_end(owner_id)
+    while len(self._owners) > self.max_size:
+      self._owners.popitem(last=False)
+
+  def invalidate(self, owner_id: ObjectId | None = None):
+    """Remove categories of the owner (or of all owners, e.g. when system categories change)."""
+    if owner_id is None:
+      self._owners.clear()
+    else:
+      self._owners.pop(owner_id, None)
+
+
+categories_cache = CategoriesCache()
+
+
 def normalize_whitespace(s: str) -> str:
   return re.sub(r"\s+", " ", s).strip()
 
 
-async def get_category_by_name(db: Database, name: str, owner_id: str):
-  return await db.categories.find_one({
-    "nameNormalized": normalize_whitespace(name).lower(),
+def normalize_name(name: str) -> str:
+  return normalize_whitespace(name).lower()
+
+
+def get_owner_filter(owner_id: ObjectId) -> dict:
+  """Return filter of categories available for the owner."""
+  return {
     "$or": [
       { "type": "user", "ownerId": owner_id },
       { "type": "system", "ownerId": None },
     ]
+  }
+
+
+async def get_category_by_name(db: Database, name: str, owner_id: str):
+  return await db.categories.find_one({
+    "nameNormalized": normalize_name(name),
+    **get_owner_filter(ObjectId(owner_id)),
   })
 
 
@@ -25,16 +75,15 @@ async def create_category(db: Database, name: str, owner_id: str):
       status_code=400,
       detail="You can only create user category so owner has to be specified"
     )
-  
+
   doc = {
     "ownerId": ObjectId(owner_id),
     "type": "user",
     "name": normalize_whitespace(name),
-    "nameNormalized": normalize_whitespace(name).lower(),
+    "nameNormalized": normalize_name(name),
   }
   result = await db.categories.insert_one(doc)
-
-  print("inserted category result", result)
+  categories_cache.invalidate(doc["ownerId"])
 
   doc_with_id = dict(doc)
   doc_with_id["_id"] = result.inserted_id
@@ -47,30 +96,58 @@ async def get_or_create_category(db, name: str, owner_id: str):
   if category is None:
     category = await create_category(db, name, owner_id)
 
-  print("found or created category", category)
-
   return category
-  
 
-async def create_categories_map(
+
+async def get_categories_map(
   db: Database,
-  owner_id: str,
-  transactions: list[TransactionCreate],
+  owner_id: str | ObjectId,
+  names: Iterable[str],
 ) -> dict[str, ObjectId]:
-  
-  categories = set()
-
-  for transaction in transactions:
-    categories.add(transaction["category"])
+  """Return IDs of categories (user categories of the owner or system ones) by their names.
+  Categories which are not cached are found with a single query and the missing ones are
+  created (as user categories) with another one."""
+  owner_id = ObjectId(owner_id)
+  normalized_names = { name: normalize_name(name) for name in names }
+  ids = categories_cache.get(owner_id)
+  missing = { n for n in normalized_names.values() if n not in ids }
+  if not missing:
+    return { name: ids[n] for name, n in normalized_names.items() }
+
+  categories = await db.categories.find(
+    { "nameNormalized": { "$in": list(missing) }, **get_owner_filter(owner_id) },
+    projection={ "nameNormalized": 1, "type": 1 },
+  ).to_list(length=None)
+
+  # system categories take precedence over user categories with the same name
+  found = {
+    category["nameNormalized"]: category["_id"]
+    for category in sorted(categories, key=lambda category: category["type"] == "system")
+  }
 
-  categories_map = {}
+  new_categories = {}
+  for name, n in normalized_names.items():
+    if n in missing and n not in found and n not in new_categories:
+      new_categories[n] = {
+        "ownerId": owner_id,
+        "type": "user",
+        "name": normalize_whitespace(name),
+        "nameNormalized": n,
+      }
+  if new_categories:
+    result = await db.categories.insert_many(list(new_categories.values()))
+    found.update(zip(new_categories, result.inserted_ids))
 
-  for category_name in categories:
-    category = await get_or_create_category(db, category_name, owner_id)
-    if category is None:
-      print(f"category {category_name} not found")
-      continue
+  categories_cache.update(owner_id, found)
+  ids = { **ids, **found }
+  return { name: ids[n] for name, n in normalized_names.items() }
 
-    categories_map[category_name] = category["_id"]
 
-  return categories_map
+async def create_categories_map(
+  db: Database,
+  owner_id: str,
+  transactions: list[TransactionCreate],
+) -> dict[str, ObjectId]:
+  return await get_categories_map(
+    db, owner_id, { transaction["category"] for transaction in transactions }
+  )
@@ -1,12 +1,23 @@
 import csv
+import codecs
 from bson import ObjectId
-from io import StringIO
+from typing import AsyncIterator
 from fastapi import UploadFile, status
 from app.api.errors import AppError
+from pydantic import TypeAdapter
 from app.schema.transaction import TransactionCreate
 from pydantic_core import ValidationError
 
 
+# size of parts of the uploaded file read at once
+CSV_CHUNK_SIZE = 64 * 1024
+
+CsvRow = tuple[int, dict]
+
+# whole batches of rows are validated and dumped at once
+TRANSACTIONS_ADAPTER = TypeAdapter(list[TransactionCreate])
+
+
 def normalize_csv_row(row: dict) -> dict:
   normalized_row = {}
   for key, value in row.items():
@@ -16,31 +27,92 @@ def normalize_csv_row(row: dict) -> dict:
       normalized_row[key] = value
   return normalized_row
 
-async def prepare_transactions_from_csv(
-    file: UploadFile,
-    id: str,
-  ) -> tuple[list[TransactionCreate], list[dict]]:
-  if not file.filename.endswith(".csv"):
-    raise AppError(status.HTTP_400_BAD_REQUEST, "Only CSV files are supported.")
-  
-  content = await file.read()
-  decoded = content.decode("utf-8")
-  csv_reader = csv.DictReader(StringIO(decoded))
-
-  valid_docs = []
-  errors = []
-
-  for i, row in enumerate(csv_reader, start=1):
-    try:
-      transaction = TransactionCreate(
-        **normalize_csv_row(row),
-        ownerId=ObjectId(id)
-      )
-      valid_docs.append(transaction.model_dump(by_alias=True))
-    except ValidationError as e:
-      errors.append({ "row": i, "error": e.errors() })
-
-  if not valid_docs:
-    raise AppError(status.HTTP_400_BAD_REQUEST, "No valid transactions found in CSV.")
-
-  return valid_docs, errors
+
+async def iter_csv_records(
+  file: UploadFile,
+  chunk_size: int = CSV_CHUNK_SIZE,
+) -> AsyncIterator[str]:
+  """Yield complete CSV records of the uploaded file which is read part by part. A record is
+  a single line or more of them when some quoted value contains new lines."""
+  decoder = codecs.getincrementaldecoder("utf-8")()
+  pending = ""
+  record = ""
+  quotes = 0
+
+  try:
+    while chunk := await file.read(chunk_size):
+      *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+      for line in lines:
+        record += line + "\n"
+        # quotes inside of quoted values are doubled so the record is complete when the number of
+        # them is even
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+          yield record
+          record = ""
+          quotes = 0
+    record += pending + decoder.decode(b"", final=True)
+  except UnicodeDecodeError:
+    raise AppError(status.HTTP_400_BAD_REQUEST, "CSV file has to be encoded in UTF-8.")
+
+  if record:
+    yield record
+
+
+async def iter_csv_batches(
+  file: UploadFile,
+  batch_size: int,
+  chunk_size: int = CSV_CHUNK_SIZE,
+) -> AsyncIterator[list[CsvRow]]:
+  """Yield batches of rows (with their numbers) of the uploaded CSV file as dicts with columns
+  from its header. Only a single batch is kept in memory."""
+  header = None
+  row_number = 0
+  records = []
+
+  def parse_records() -> list[CsvRow]:
+    nonlocal header, row_number
+    rows = []
+    for values in csv.reader(records):
+      # empty lines are skipped (like in `csv.DictReader`)
+      if not values:
+        continue
+      if header is None:
+        header = values
+        continue
+      row_number += 1
+      row = dict.fromkeys(header)
+      row.update(zip(header, values))
+      rows.append((row_number, row))
+    return rows
+
+  async for record in iter_csv_records(file, chunk_size):
+    records.append(record)
+    if len(records) == batch_size:
+      yield parse_records()
+      records = []
+
+  if records:
+    yield parse_records()
+
+
+def validate_transactions(rows: list[dict]) -> list[dict]:
+  return TRANSACTIONS_ADAPTER.dump_python(TRANSACTIONS_ADAPTER.validate_python(rows), by_alias=True)
+
+
+def validate_csv_rows(rows: list[CsvRow], owner_id: ObjectId) -> tuple[list[dict], list[dict]]:
+  """Return documents (ready to be inserted) of valid transactions and errors of invalid ones.
+  It is run in worker processes so everything passed and returned has to be picklable."""
+  values = [{ **normalize_csv_row(row), "ownerId": owner_id } for _, row in rows]
+  try:
+    return validate_transactions(values), []
+  except ValidationError as e:
+    # the first item of the location of every error is the index of the row in the batch
+    rows_errors = {}
+    for error in e.errors():
+      index, *loc = error["loc"]
+      rows_errors.setdefault(index, []).append({ **error, "loc": tuple(loc) })
+
+  errors = [{ "row": rows[index][0], "error": error } for index, error in rows_errors.items()]
+  valid_values = [row for index, row in enumerate(values) if index not in rows_errors]
+  return validate_transactions(valid_values), errors
@@ -0,0 +1,192 @@
+import asyncio
+from bson import ObjectId
+from collections import deque
+from concurrent.futures import Executor
+from typing import Optional
+from pymongo import UpdateOne
+from fastapi import UploadFile, status
+from app.api.errors import AppError
+from app.db.database import Database
+from app.api.responses import CreateManyTransactions
+from app.services.category_service import create_categories_map
+from app.services.csv_service import CsvRow, iter_csv_batches, validate_csv_rows
+from app.services.report_service import ErrorsReport
+from app.services.transaction_service import (
+  delete_transactions_by_ids,
+  serialize_object_id_if_any,
+  update_transactions_counter,
+)
+
+
+# number of rows validated and inserted at once
+IMPORT_BATCH_SIZE = 1000
+# number of validated batches waiting for insertion - it bounds the memory when the database
+# is slower than the validation
+IMPORT_QUEUE_SIZE = 4
+
+
+def get_duplicate_error(row: int, source_index: int) -> dict:
+  return {
+    "row": row,
+    "error": [{
+      "type": "duplicate_source_index",
+      "loc": ("sourceIndex",),
+      "msg": "Value of 'sourceIndex' is not unique",
+      "input": source_index,
+    }],
+  }
+
+
+async def import_transactions_csv(
+  db: Database,
+  file: UploadFile,
+  id: str,
+  pool: Optional[Executor] = None,
+  pool_size: int = 1,
+  batch_size: int = IMPORT_BATCH_SIZE,
+  queue_size: int = IMPORT_QUEUE_SIZE,
+) -> CreateManyTransactions:
+  """Import transactions of the user (who cannot have any transactions yet) from CSV file.
+
+  The file is read, validated and inserted batch by batch - validation of the next batches is
+  done while the previous ones are inserted. Batches are validated in the `pool` of processes
+  (`pool_size` of them at once) or in a thread when there is no pool, so the event loop is not
+  blocked. The import is all or nothing, so when any row is invalid (or anything fails) all
+  transactions inserted by it are deleted."""
+  if not file.filename.endswith(".csv"):
+    raise AppError(status.HTTP_400_BAD_REQUEST, "Only CSV files are supported.")
+
+  owner_id = ObjectId(id)
+  queue: asyncio.Queue[Optional[list[dict]]] = asyncio.Queue(maxsize=queue_size)
+  report = ErrorsReport()
+  valid_count = 0
+
+  # `sourceIndex` of all valid rows - it has to be unique as references are based on it
+  source_indexes: set[int] = set()
+  # IDs are created before inserting so references to already inserted transactions can be set
+  # at once - only references to the next transactions are updated at the end
+  ids: dict[int, ObjectId] = {}
+  # all inserted IDs (to remove them when the import fails)
+  inserted_ids: list[ObjectId] = []
+  pending_refs: list[tuple[int, int]] = []
+  categories_map: dict[str, ObjectId] = {}
+
+  loop = asyncio.get_running_loop()
+  # batches validated at the same time (results are taken in the order of batches)
+  in_flight: deque[tuple[list[CsvRow], asyncio.Future]] = deque()
+  max_in_flight = max(pool_size, 1) if pool is not None else 1
+
+  async def take_validated():
+    nonlocal valid_count
+    rows, future = in_flight.popleft()
+    validated_docs, errors = await future
+
+    # rows are checked here (not in the pool) as duplicates can be in different batches
+    invalid_rows = {error["row"] for error in errors}
+    valid_rows = [row for row, _ in rows if row not in invalid_rows]
+    docs = []
+    for row, doc in zip(valid_rows, validated_docs):
+      if doc["sourceIndex"] in source_indexes:
+        errors.append(get_duplicate_error(row, doc["sourceIndex"]))
+      else:
+        source_indexes.add(doc["sourceIndex"])
+        docs.append(doc)
+    errors.sort(key=lambda error: error["row"])
+
+    report.add(errors)
+    valid_count += len(docs)
+    # nothing is inserted after the first error as the whole import is rejected anyway
+    if docs and not report.count:
+      await queue.put(docs)
+
+  async def validate_batches():
+    try:
+      async for rows in iter_csv_batches(file, batch_size):
+        future = loop.run_in_executor(pool, validate_csv_rows, rows, owner_id)
+        in_flight.append((rows, future))
+        if len(in_flight) > max_in_flight:
+          await take_validated()
+      while in_flight:
+        await take_validated()
+    except Exception:
+      # insertion is finished and the error is raised when the task is awaited
+      await queue.put(None)
+      raise
+    await queue.put(None)
+
+  async def insert_batch(docs: list[dict]):
+    new_categories = [doc for doc in docs if doc["category"] not in categories_map]
+    if new_categories:
+      categories_map.update(await create_categories_map(db, id, new_categories))
+
+    for doc in docs:
+      doc["categoryId"] = categories_map[doc.pop("category")]
+      doc["_id"] = ids[doc["sourceIndex"]] = ObjectId()
+      inserted_ids.append(doc["_id"])
+      ref = doc.get("sourceRefIndex")
+      if not ref:
+        continue
+      if ref in ids:
+        doc["refId"] = ids[ref]
+      else:
+        pending_refs.append((doc["sourceIndex"], ref))
+
+    await db.transactions.insert_many(docs)
+
+  async def update_references() -> list[dict]:
+    updates = []
+    update_errors = []
+    for source_index, ref in pending_refs:
+      if ref in ids:
+        updates.append(
+          UpdateOne({ "_id": ids[source_index] }, { "$set": { "refId": ids[ref] } })
+        )
+      else:
+        update_errors.append({
+          "sourceIndex": source_index,
+          "error": f"Broken 'sourceRefIndex' - {ref}",
+        })
+    if updates:
+      await db.transactions.bulk_write(updates)
+    return update_errors
+
+  validation = asyncio.create_task(validate_batches())
+  try:
+    while (docs := await queue.get()) is not None:
+      if not report.count:
+        await insert_batch(docs)
+    await validation
+
+    if valid_count == 0:
+      raise AppError(status.HTTP_400_BAD_REQUEST, "No valid transactions found in CSV.")
+
+    if report.count:
+      raise AppError(
+        status.HTTP_400_BAD_REQUEST,
+        "Invalid transactions found in CSV.",
+        details={
+          "valid_transactions_count": valid_count,
+          "invalid_transactions_count": report.count,
+          "first_10_errors": list(map(serialize_object_id_if_any, report.first_errors)),
+          # the report can be downloaded with `GET /import-reports/{id}`
+          "errors_report_id": report.id,
+        },
+      )
+
+    update_errors = await update_references()
+    await update_transactions_counter(db, owner_id)
+  except BaseException:
+    validation.cancel()
+    for _, future in in_flight:
+      future.cancel()
+    await delete_transactions_by_ids(db, inserted_ids, batch_size)
+    raise
+  finally:
+    report.close()
+
+  return {
+    "imported": len(inserted_ids),
+    "skipped": 0,
+    "errors": [],
+    "updateErrors": update_errors,
+  }
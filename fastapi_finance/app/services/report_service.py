@@ -0,0 +1,77 @@
+import re
+import json
+import time
+import uuid
+from pathlib import Path
+from fastapi import status
+from app.api.errors import AppError
+from app.core.config import settings
+
+
+# number of errors kept in memory (all of them are in the report)
+ERRORS_TO_SHOW = 10
+
+REPORT_SUFFIX = ".ndjson"
+REPORT_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def get_reports_dir() -> Path:
+  return Path(settings.IMPORT_REPORTS_DIR)
+
+
+def get_report_path(report_id: str) -> Path:
+  return get_reports_dir() / f"{report_id}{REPORT_SUFFIX}"
+
+
+def is_expired(path: Path, now: float) -> bool:
+  return now - path.stat().st_mtime > settings.IMPORT_REPORTS_RETENTION_DAYS * 24 * 60 * 60
+
+
+def remove_expired_reports():
+  """Remove reports older than `IMPORT_REPORTS_RETENTION_DAYS`."""
+  now = time.time()
+  for path in get_reports_dir().glob(f"*{REPORT_SUFFIX}"):
+    try:
+      if is_expired(path, now):
+        path.unlink()
+    except FileNotFoundError:
+      # removed in the meantime (e.g. by other import)
+      pass
+
+
+def get_report_file(report_id: str) -> Path:
+  """Return path of the report with the given id (it has to exist and not be expired)."""
+  if REPORT_ID_PATTERN.fullmatch(report_id) is not None:
+    path = get_report_path(report_id)
+    if path.is_file() and not is_expired(path, time.time()):
+      return path
+  raise AppError(status.HTTP_404_NOT_FOUND, f"Import report with id: '{report_id}' not found")
+
+
+class ErrorsReport:
+  """Errors of invalid rows written to NDJSON file as they are found. Only the first of them are
+  kept in memory (to be returned in the response). The file is created with the first error and
+  it can be downloaded by its `id` until it expires."""
+  def __init__(self):
+    self.id = uuid.uuid4().hex
+    self.count = 0
+    self.first_errors = []
+    self._file = None
+
+  def add(self, errors: list[dict]):
+    if not errors:
+      return
+
+    if self._file is None:
+      get_reports_dir().mkdir(parents=True, exist_ok=True)
+      remove_expired_reports()
+      self._file = get_report_path(self.id).open("w", encoding="utf-8")
+
+    for error in errors:
+      self._file.write(json.dumps(error, default=str, ensure_ascii=False) + "\n")
+    self.first_errors.extend(errors[:ERRORS_TO_SHOW - len(self.first_errors)])
+    self.count += len(errors)
+
+  def close(self):
+    if self._file is not None:
+      self._file.close()
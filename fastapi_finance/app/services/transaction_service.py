@@ -11,6 +11,14 @@ from app.db.database import Database
 from app.api.responses import CreateManyTransactions
 from datetime import datetime, timezone
 from pymongo import UpdateOne
+from typing import AsyncIterator, Optional
+from app.utils.pagination import TRANSACTIONS_ORDER, TransactionKey, get_keyset_filter
+
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10_000
+# number of transactions sent at once when they are streamed
+STREAM_BATCH_SIZE = 500
 
 
 def normalize_id(transaction):
@@ -18,13 +26,49 @@ def normalize_id(transaction):
   return transaction
 
 
-async def get_all_transactions(db: Database) -> list[TransactionInDB]:
-  transactions = await db.transactions.find().to_list(length=None)
+async def get_all_transactions(
+  db: Database,
+  limit: int = DEFAULT_PAGE_SIZE,
+  after: Optional[TransactionKey] = None,
+  query: Optional[dict] = None,
+) -> list[TransactionInDB]:
+  """Return page of at most `limit` transactions matching `query` which are after the given one."""
+  transactions = await db.transactions.find(
+    { **(query or {}), **get_keyset_filter(after) },
+    sort=TRANSACTIONS_ORDER,
+    limit=limit,
+  ).to_list(length=limit)
   return [TransactionInDB.model_validate(normalize_id(t)) for t in transactions]
 
 
-async def get_all_transactions_count(db: Database) -> int:
-  return await db.transactions.count_documents({})
+async def stream_transactions(
+  db: Database,
+  after: Optional[TransactionKey] = None,
+  query: Optional[dict] = None,
+  batch_size: int = STREAM_BATCH_SIZE,
+) -> AsyncIterator[str]:
+  """Yield transactions as lines of JSON (NDJSON) - batch by batch as they are read from the
+  cursor, so all of them are never kept in memory at the same time."""
+  cursor = db.transactions.find(
+    { **(query or {}), **get_keyset_filter(after) },
+    sort=TRANSACTIONS_ORDER,
+    batch_size=batch_size,
+  )
+  lines = []
+  async for transaction in cursor:
+    lines.append(
+      TransactionInDB.model_validate(normalize_id(transaction)).model_dump_json(by_alias=True)
+    )
+    if len(lines) == batch_size:
+      yield "\n".join(lines) + "\n"
+      lines = []
+
+  if lines:
+    yield "\n".join(lines) + "\n"
+
+
+async def get_all_transactions_count(db: Database, query: Optional[dict] = None) -> int:
+  return await db.transactions.count_documents(query or {})
 
 
 async def get_transaction(db: Database, id: str) -> TransactionInDB:
@@ -97,7 +141,8 @@ def serialize_object_id_if_any(obj):
 
   for e in error:
     input_dict = e.get("input")
-    if input_dict is None:
+    # only errors of whole transactions have their data as input (other ones have single values)
+    if not isinstance(input_dict, dict):
       new_error_arr.append(e)
     else:
       input_dict = dict(input_dict)
@@ -112,6 +157,31 @@ def serialize_object_id_if_any(obj):
   obj['error'] = new_error_arr
   return obj
 
+
+async def update_transactions_counter(db: Database, owner_id: ObjectId):
+  """Store the max `source_index` of transactions of the owner to properly add new transaction."""
+  max_source_index = await db.transactions.find_one(
+    { "ownerId": owner_id },
+    sort=[("sourceIndex", -1)],
+    projection={"sourceIndex": 1}
+  )
+  start = max_source_index["sourceIndex"] if max_source_index else 0
+  await db.counters.update_one(
+    {"_id": {"type": "transactions", "userId": owner_id}},
+    {"$set": {"seq": start}},
+    upsert=True
+  )
+
+async def delete_transactions_by_ids(db: Database, ids: list[ObjectId], batch_size: int) -> int:
+  """Remove transactions with given IDs (in chunks, so the query is never too big) - e.g. to undo
+  an import without touching other transactions of the user added in the meantime."""
+  deleted_count = 0
+  for start in range(0, len(ids), batch_size):
+    result = await db.transactions.delete_many({ "_id": { "$in": ids[start:start + batch_size] } })
+    deleted_count += result.deleted_count
+  return deleted_count
+
+
 async def create_many_transactions(
     db: Database,
     transactions: list[TransactionCreate],
@@ -174,18 +244,7 @@ async def create_many_transactions(
 
   # ------------------------------------------------------------------
   # store the max `source_index` to properly add new transaction
-  owner_id = transactions[0]["ownerId"]
-  max_source_index = await db.transactions.find_one(
-    { "ownerId": owner_id },
-    sort=[("sourceIndex", -1)],
-    projection={"sourceIndex": 1}
-  )
-  start = max_source_index["sourceIndex"] if max_source_index else 0
-  await db.counters.update_one(
-    {"_id": {"type": "transactions", "userId": owner_id}},
-    {"$set": {"seq": start}},
-    upsert=True
-  )
+  await update_transactions_counter(db, transactions[0]["ownerId"])
   # ------------------------------------------------------------------
 
   errors_to_show = list(map(serialize_object_id_if_any, errors[:10]))
@@ -1,6 +1,11 @@
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
 from fastapi import FastAPI
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
 
 class MongoDBFastAPI(FastAPI):
   mongodb_client: AsyncIOMotorClient = None
-  mongodb: AsyncIOMotorDatabase = None
\ No newline at end of file
+  mongodb: AsyncIOMotorDatabase = None
+  validation_pool: Optional[ProcessPoolExecutor] = None
+  # number of processes of `validation_pool`
+  validation_pool_size: int = 0
\ No newline at end of file
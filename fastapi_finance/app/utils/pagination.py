@@ -0,0 +1,50 @@
+import json
+import base64
+import binascii
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+from typing import Optional
+from fastapi import status
+from app.api.errors import AppError
+
+
+# transactions are listed in this order so the last one of a page is enough to get the next one
+TRANSACTIONS_ORDER = [("ownerId", 1), ("date", 1), ("_id", 1)]
+
+# header with the token for getting the next page (it is not set for the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+TransactionKey = tuple[ObjectId, datetime, ObjectId]
+
+
+def encode_cursor(owner_id: ObjectId, date: datetime, id: ObjectId | str) -> str:
+  """Return opaque token pointing at the transaction after which the next page starts."""
+  data = json.dumps({ "o": str(owner_id), "d": date.isoformat(), "i": str(id) })
+  return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[TransactionKey]:
+  if cursor is None:
+    return None
+
+  try:
+    data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return ObjectId(data["o"]), datetime.fromisoformat(data["d"]), ObjectId(data["i"])
+  except (binascii.Error, json.JSONDecodeError, KeyError, TypeError, ValueError, InvalidId):
+    raise AppError(status.HTTP_400_BAD_REQUEST, f"Invalid cursor: '{cursor}'")
+
+
+def get_keyset_filter(after: Optional[TransactionKey]) -> dict:
+  """Return filter of transactions which are after the given one in `TRANSACTIONS_ORDER`."""
+  if after is None:
+    return {}
+
+  owner_id, date, id = after
+  return {
+    "$or": [
+      { "ownerId": { "$gt": owner_id } },
+      { "ownerId": owner_id, "date": { "$gt": date } },
+      { "ownerId": owner_id, "date": date, "_id": { "$gt": id } },
+    ]
+  }
@@ -1,4 +1,7 @@
+from bson import ObjectId
+from datetime import datetime
 from unittest.mock import AsyncMock, patch
+from app.schema.transaction import TransactionInDB
 
 def test_get_transactions_route(client):
   fake_transactions = [{
@@ -25,4 +28,87 @@ def test_get_transactions_route(client):
     response = client.get("/api/transactions/")
 
   assert response.status_code == 200
-  assert response.json() == fake_transactions
\ No newline at end of file
+  assert response.json() == fake_transactions
+
+def get_transaction_in_db(**values):
+  return TransactionInDB.model_validate({
+    "_id": "69063624e7365e4b30c0b473",
+    "date": "2015-08-31T00:00:00",
+    "description": "Otwarcie rachunku",
+    "amount": 0,
+    "currency": "PLN",
+    "category": "Inne",
+    "paymentMethod": "incomingTransfer",
+    "account": "mBank",
+    "transactionType": "income",
+    "ownerId": ObjectId("69063624e7365e4b30c0b470"),
+    "sourceIndex": 1,
+    **values,
+  })
+
+
+def test_get_transactions_page_sets_next_cursor(client):
+  transaction = get_transaction_in_db()
+  get_all = AsyncMock(return_value=[transaction])
+
+  with patch("app.api.routes.get_all_transactions", get_all):
+    response = client.get("/api/transactions/", params={"limit": 1})
+    next_response = client.get(
+      "/api/transactions/", params={"limit": 1, "cursor": response.headers["X-Next-Cursor"]}
+    )
+
+  assert response.status_code == 200
+  assert response.json()[0]["_id"] == transaction.id
+  assert next_response.status_code == 200
+  # the next page starts after the last transaction of the previous one
+  assert get_all.await_args_list[1].args[1:] == (
+    1, (transaction.ownerId, transaction.date, ObjectId(transaction.id)), {}
+  )
+
+
+def test_get_transactions_count_with_filters(client):
+  count = AsyncMock(return_value=3)
+
+  with patch("app.api.routes.get_all_transactions_count", count):
+    response = client.get("/api/transactions/count", params={
+      "ownerId": "69063624e7365e4b30c0b470",
+      "dateFrom": "2015-01-01",
+      "dateTo": "2015-12-31",
+      "account": "mBank",
+      "transactionType": "expense",
+    })
+
+  assert response.status_code == 200
+  assert response.json() == { "count": 3 }
+  assert count.await_args.args[1] == {
+    "ownerId": ObjectId("69063624e7365e4b30c0b470"),
+    # the whole last day is included
+    "date": { "$gte": datetime(2015, 1, 1), "$lt": datetime(2016, 1, 1) },
+    "account": "mBank",
+    "transactionType": "expense",
+  }
+
+
+def test_get_transactions_with_invalid_owner_id(client):
+  response = client.get("/api/transactions/", params={"ownerId": "not-an-id"})
+
+  assert response.status_code == 400
+
+
+def test_get_transactions_with_invalid_cursor(client):
+  response = client.get("/api/transactions/", params={"cursor": "not-a-cursor"})
+
+  assert response.status_code == 400
+
+
+def test_stream_transactions_route(client):
+  async def fake_stream(db, after, query):
+    yield '{"sourceIndex": 1}\n'
+    yield '{"sourceIndex": 2}\n'
+
+  with patch("app.api.routes.stream_transactions", fake_stream):
+    response = client.get("/api/transactions/stream")
+
+  assert response.status_code == 200
+  assert response.headers["content-type"] == "application/x-ndjson"
+  assert response.text.splitlines() == ['{"sourceIndex": 1}', '{"sourceIndex": 2}']
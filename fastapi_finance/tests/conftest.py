@@ -1,4 +1,5 @@
 import pytest
+from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -8,6 +9,12 @@ def client():
   """
   Provides a reusable TestClient instance for the FastAPI app.
   Scoped per module to improve speed while isolating tests.
+  Indexes are not created at startup as there is no MongoDB server in tests and processes for
+  validation of imports are not started (validation is done in a thread then).
   """
-  with TestClient(app) as test_client:
+  with (
+    patch("app.main.ensure_indexes", AsyncMock()),
+    patch("app.main.init_validation_pool"),
+    TestClient(app) as test_client,
+  ):
     yield test_client
@@ -0,0 +1,26 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from pymongo.errors import OperationFailure
+from app.db.indexes import INDEXES, ensure_indexes
+
+
+def test_conflicting_existing_index_is_skipped():
+  db = MagicMock()
+  conflict = OperationFailure("Index already exists with a different name", code=85)
+  db.transactions.create_indexes = AsyncMock(side_effect=[conflict, ["a"], ["b"]])
+  db.categories.create_indexes = AsyncMock(return_value=["c"])
+
+  asyncio.run(ensure_indexes(db))
+
+  # the next indexes are created after the conflict
+  assert db.transactions.create_indexes.await_count == len(INDEXES["transactions"])
+  db.categories.create_indexes.assert_awaited_once()
+
+
+def test_other_index_errors_are_raised():
+  db = MagicMock()
+  db.transactions.create_indexes = AsyncMock(side_effect=OperationFailure("denied", code=13))
+
+  with pytest.raises(OperationFailure):
+    asyncio.run(ensure_indexes(db))
@@ -0,0 +1,85 @@
+import json
+import pytest
+from bson import ObjectId
+from unittest.mock import patch
+from pydantic_core import ValidationError
+from app.core.vocabulary import load_vocabulary
+from app.schema.transaction import TransactionCreate, TransactionInDB, TransactionPartialUpdate
+
+
+def get_transaction_data(**values):
+  return {
+    "date": "2015-08-31",
+    "description": "Otwarcie rachunku",
+    "amount": 10.5,
+    "currency": "PLN",
+    "category": "Jedzenie",
+    "paymentMethod": "card",
+    "account": "mBank",
+    "transactionType": "expense",
+    "ownerId": ObjectId(),
+    "sourceIndex": 1,
+    **values,
+  }
+
+
+@pytest.fixture
+def vocabulary(tmp_path):
+  vocabulary_file = tmp_path / "vocabulary.json"
+  vocabulary_file.write_text(json.dumps({
+    "version": 1,
+    "hash": "abc",
+    "values": {
+      "currency": ["PLN", "EUR"],
+      "category": ["Jedzenie", "exchange", "myAccount"],
+      "payment_method": ["card", "cash"],
+      "account": ["mBank", "pekao"],
+      "currencies": ["PLN/EUR", "EUR/PLN"],
+      "transaction_type": ["expense", "income"],
+    },
+    "used": {},
+    "system_categories": ["exchange", "myAccount"],
+  }))
+  return load_vocabulary(str(vocabulary_file))
+
+
+def test_known_values_are_accepted(vocabulary):
+  with patch("app.schema.transaction.vocabulary", vocabulary):
+    transaction = TransactionCreate(**get_transaction_data())
+
+  assert transaction.account == "mBank"
+  assert transaction.payment_method == "card"
+
+
+def test_unknown_values_are_rejected(vocabulary):
+  with patch("app.schema.transaction.vocabulary", vocabulary):
+    with pytest.raises(ValidationError) as exc_info:
+      TransactionCreate(**get_transaction_data(account="Alior", currency="USD"))
+
+  errors = exc_info.value.errors()
+  assert [error["type"] for error in errors] == ["unknown_value", "unknown_value"]
+  assert {error["loc"][0] for error in errors} == {"account", "currency"}
+
+
+def test_any_values_are_accepted_without_vocabulary():
+  with patch("app.schema.transaction.vocabulary", None):
+    transaction = TransactionCreate(**get_transaction_data(account="Alior"))
+
+  assert transaction.account == "Alior"
+
+
+def test_stored_transactions_with_unknown_values_are_loaded(vocabulary):
+  with patch("app.schema.transaction.vocabulary", vocabulary):
+    transaction = TransactionInDB(
+      **get_transaction_data(currency="CHF"), _id="69063624e7365e4b30c0b473"
+    )
+
+  assert transaction.currency == "CHF"
+
+
+def test_unknown_values_are_rejected_in_partial_update(vocabulary):
+  with patch("app.schema.transaction.vocabulary", vocabulary):
+    with pytest.raises(ValidationError) as exc_info:
+      TransactionPartialUpdate(currency="CHF")
+
+  assert [error["type"] for error in exc_info.value.errors()] == ["unknown_value"]
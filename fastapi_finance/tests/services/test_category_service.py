@@ -0,0 +1,79 @@
+import asyncio
+from typing import Optional
+from bson import ObjectId
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.category_service import (
+  CategoriesCache,
+  create_category,
+  get_categories_map,
+)
+
+
+OWNER_ID = ObjectId("69063624e7365e4b30c0b470")
+
+
+def get_db(categories: list[dict], inserted_ids: Optional[list[ObjectId]] = None):
+  db = MagicMock()
+  db.categories.find.return_value.to_list = AsyncMock(return_value=categories)
+  db.categories.insert_many = AsyncMock(
+    return_value=SimpleNamespace(inserted_ids=list(inserted_ids or []))
+  )
+  db.categories.insert_one = AsyncMock(return_value=SimpleNamespace(inserted_id=ObjectId()))
+  return db
+
+
+def test_categories_are_found_and_created_at_once_and_cached():
+  food_id, exchange_id, user_exchange_id, new_id = ObjectId(), ObjectId(), ObjectId(), ObjectId()
+  db = get_db(
+    [
+      { "_id": exchange_id, "nameNormalized": "exchange", "type": "system" },
+      { "_id": user_exchange_id, "nameNormalized": "exchange", "type": "user" },
+      { "_id": food_id, "nameNormalized": "jedzenie", "type": "user" },
+    ],
+    [new_id],
+  )
+
+  with patch("app.services.category_service.categories_cache", CategoriesCache()):
+    categories_map = asyncio.run(
+      get_categories_map(db, str(OWNER_ID), ["Jedzenie", "exchange", "Nowa  kategoria "])
+    )
+    cached_map = asyncio.run(get_categories_map(db, OWNER_ID, ["jedzenie", "Nowa kategoria"]))
+
+  assert categories_map == {
+    "Jedzenie": food_id,
+    "exchange": exchange_id,
+    "Nowa  kategoria ": new_id,
+  }
+  assert cached_map == { "jedzenie": food_id, "Nowa kategoria": new_id }
+  db.categories.find.assert_called_once()
+  db.categories.insert_many.assert_awaited_once_with([{
+    "ownerId": OWNER_ID,
+    "type": "user",
+    "name": "Nowa kategoria",
+    "nameNormalized": "nowa kategoria",
+  }])
+
+
+def test_cache_is_invalidated_by_created_category():
+  db = get_db([{ "_id": ObjectId(), "nameNormalized": "jedzenie", "type": "user" }])
+
+  with patch("app.services.category_service.categories_cache", CategoriesCache()):
+    asyncio.run(get_categories_map(db, OWNER_ID, ["Jedzenie"]))
+    asyncio.run(create_category(db, "Zdrowie", str(OWNER_ID)))
+    asyncio.run(get_categories_map(db, OWNER_ID, ["Jedzenie"]))
+
+  assert db.categories.find.call_count == 2
+
+
+def test_categories_of_least_recently_used_owners_are_evicted():
+  cache = CategoriesCache(max_size=2)
+  owners = [ObjectId() for _ in range(3)]
+
+  cache.update(owners[0], { "a": ObjectId() })
+  cache.update(owners[1], { "b": ObjectId() })
+  cache.get(owners[0])
+  cache.update(owners[2], { "c": ObjectId() })
+
+  assert cache.get(owners[1]) == {}
+  assert list(cache.get(owners[0])) == ["a"]
@@ -0,0 +1,74 @@
+import io
+import csv
+import asyncio
+import pytest
+from bson import ObjectId
+from fastapi import UploadFile
+from app.api.errors import AppError
+from app.services.csv_service import iter_csv_batches, validate_csv_rows
+
+
+CSV_TEXT = 'a,b,c\n1,"x\n""y"",\nz",3\n\n2,,\r\n3,"ą ł",5\n4,"last"'
+
+
+def get_batches(content: bytes, batch_size: int, chunk_size: int) -> list[list]:
+  async def collect():
+    file = UploadFile(io.BytesIO(content), filename="transactions.csv")
+    return [batch async for batch in iter_csv_batches(file, batch_size, chunk_size)]
+  return asyncio.run(collect())
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1024])
+def test_csv_is_read_in_batches_like_with_dict_reader(chunk_size):
+  batches = get_batches(CSV_TEXT.encode(), 2, chunk_size)
+
+  expected = list(enumerate(csv.DictReader(io.StringIO(CSV_TEXT, newline="")), start=1))
+  assert [row for batch in batches for row in batch] == expected
+  assert expected[0][1]["b"] == 'x\n"y",\nz'
+  assert len(batches) == 3
+
+
+def test_csv_not_encoded_in_utf8_is_rejected():
+  with pytest.raises(AppError) as exc_info:
+    get_batches(b"a,b\n\xff,1\n", 2, 1024)
+
+  assert exc_info.value.status_code == 400
+
+
+def get_csv_row(**values):
+  return {
+    "source_index": "1",
+    "date": "2015-08-31",
+    "description": "Otwarcie rachunku",
+    "amount": "10.5",
+    "currency": "PLN",
+    "category": "Jedzenie",
+    "payment_method": "card",
+    "account": "mBank",
+    "exchange_rate": "",
+    "currencies": "",
+    "transaction_type": "expense",
+    "source_ref_index": "",
+    **values,
+  }
+
+
+def test_batch_is_validated_into_documents_and_errors_of_rows():
+  owner_id = ObjectId()
+  rows = [
+    (1, get_csv_row()),
+    (2, get_csv_row(source_index="2", amount="-1")),
+    (3, get_csv_row(source_index="3", currencies="PLN/EUR")),
+    (4, get_csv_row(source_index="4", description="Zakupy")),
+  ]
+
+  docs, errors = validate_csv_rows(rows, owner_id)
+
+  assert [doc["sourceIndex"] for doc in docs] == [1, 4]
+  assert docs[1]["description"] == "Zakupy"
+  assert docs[1]["ownerId"] == owner_id
+  assert docs[1]["paymentMethod"] == "card"
+  assert [error["row"] for error in errors] == [2, 3]
+  assert errors[0]["error"][0]["loc"] == ("amount",)
+  assert errors[0]["error"][0]["type"] == "amount_less_than_zero"
+  assert errors[1]["error"][0]["type"] == "other_currency_group_incomplete"
@@ -0,0 +1,116 @@
+import io
+import json
+import asyncio
+import pytest
+from bson import ObjectId
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+from fastapi import UploadFile
+from app.api.errors import AppError
+from app.services.import_service import import_transactions_csv
+from app.services.report_service import get_report_file
+
+
+OWNER_ID = "69063624e7365e4b30c0b470"
+CSV_HEADER = (
+  "source_index,date,description,amount,currency,category,payment_method,account,"
+  "exchange_rate,currencies,transaction_type,source_ref_index\n"
+)
+
+
+def get_csv_line(source_index: int, amount: str = "10.5", ref: str = "") -> str:
+  return f"{source_index},2015-08-31,Opis,{amount},PLN,myAccount,card,mBank,,,expense,{ref}\n"
+
+
+def get_db() -> MagicMock:
+  db = MagicMock()
+  db.transactions.insert_many = AsyncMock()
+  db.transactions.bulk_write = AsyncMock()
+  db.transactions.delete_many = AsyncMock()
+  return db
+
+
+def run_import(db: MagicMock, content: str, batch_size: int = 1000):
+  async def categories_map(db, owner_id, transactions):
+    return { transaction["category"]: ObjectId() for transaction in transactions }
+
+  file = UploadFile(io.BytesIO(content.encode()), filename="transactions.csv")
+  with (
+    patch("app.services.import_service.create_categories_map", categories_map),
+    patch("app.services.import_service.update_transactions_counter", AsyncMock()),
+  ):
+    return asyncio.run(import_transactions_csv(db, file, OWNER_ID, batch_size=batch_size))
+
+
+def get_inserted_docs(db: MagicMock) -> list[dict]:
+  return [doc for call in db.transactions.insert_many.await_args_list for doc in call.args[0]]
+
+
+def test_references_to_next_transactions_are_updated_at_the_end():
+  db = get_db()
+  content = CSV_HEADER + get_csv_line(1, ref="3") + get_csv_line(2) + get_csv_line(3, ref="1")
+
+  result = run_import(db, content, batch_size=2)
+
+  docs = { doc["sourceIndex"]: doc for doc in get_inserted_docs(db) }
+  assert result["imported"] == 3
+  # the referenced transaction is already inserted so the reference is set at once
+  assert docs[3]["refId"] == docs[1]["_id"]
+  assert "refId" not in docs[1]
+  [update] = db.transactions.bulk_write.await_args.args[0]
+  assert update._filter == { "_id": docs[1]["_id"] }
+  assert update._doc == { "$set": { "refId": docs[3]["_id"] } }
+  db.transactions.delete_many.assert_not_awaited()
+
+
+def test_only_inserted_transactions_are_deleted_when_row_is_invalid(tmp_path):
+  db = get_db()
+  content = CSV_HEADER + get_csv_line(1) + get_csv_line(2) + get_csv_line(3, amount="-1")
+
+  with patch("app.core.config.settings.IMPORT_REPORTS_DIR", str(tmp_path)):
+    with pytest.raises(AppError) as exc_info:
+      run_import(db, content, batch_size=2)
+    report_file = get_report_file(exc_info.value.details["errors_report_id"])
+
+  inserted_ids = [doc["_id"] for doc in get_inserted_docs(db)]
+  assert len(inserted_ids) == 1
+  db.transactions.delete_many.assert_awaited_once_with({ "_id": { "$in": inserted_ids } })
+
+  details = exc_info.value.details
+  assert details["valid_transactions_count"] == 2
+  assert details["invalid_transactions_count"] == 1
+  assert details["first_10_errors"][0]["row"] == 3
+  [error] = [json.loads(line) for line in report_file.read_text().splitlines()]
+  assert error["row"] == 3
+  assert error["error"][0]["type"] == "amount_less_than_zero"
+
+
+def test_unknown_report_is_not_found(tmp_path):
+  with patch("app.core.config.settings.IMPORT_REPORTS_DIR", str(tmp_path)):
+    for report_id in ["0" * 32, "../../etc/passwd"]:
+      with pytest.raises(AppError) as exc_info:
+        get_report_file(report_id)
+      assert exc_info.value.status_code == 404
+
+
+def test_duplicate_source_index_is_invalid_and_all_inserted_transactions_are_deleted(tmp_path):
+  db = get_db()
+  content = (
+    CSV_HEADER
+    + get_csv_line(1) + get_csv_line(2)
+    + get_csv_line(1) + get_csv_line(3)
+    + get_csv_line(4, amount="-1")
+  )
+
+  with patch("app.core.config.settings.IMPORT_REPORTS_DIR", str(tmp_path)):
+    with pytest.raises(AppError) as exc_info:
+      run_import(db, content, batch_size=2)
+
+  # the duplicate is in the batch after the first one and the invalid row is in the next one
+  inserted_ids = [doc["_id"] for doc in get_inserted_docs(db)]
+  assert [doc["sourceIndex"] for doc in get_inserted_docs(db)] == [1]
+  db.transactions.delete_many.assert_awaited_once_with({ "_id": { "$in": inserted_ids } })
+
+  errors = exc_info.value.details["first_10_errors"]
+  assert [error["row"] for error in errors] == [3, 5]
+  assert errors[0]["error"][0]["type"] == "duplicate_source_index"
@@ -15,6 +15,10 @@ VENV_DIR="$PARSER_DIR/.venv"
 # Default flags (can override with command-line arguments)
 COPY_FLAG=false
 PRINT_FLAG=false
+EXPORT_FLAG=false
+FORCE_FLAG=false
+WORKERS=1
+CHUNK_SIZE=""
 
 # -----------------------------
 # Parse command-line arguments
@@ -23,9 +27,13 @@ for arg in "$@"; do
   case "$arg" in
     --should-copy) COPY_FLAG=true ;;
     --should-print) PRINT_FLAG=true ;;
+    --export-intermediate) EXPORT_FLAG=true ;;
+    --force) FORCE_FLAG=true ;;
+    --workers=*) WORKERS="${arg#*=}" ;;
+    --chunk-size=*) CHUNK_SIZE="${arg#*=}" ;;
     *)
       echo "Unknown option: $arg"
-      echo "Usage $0 [--should-copy] [--should-print]"
+      echo "Usage $0 [--should-copy] [--should-print] [--export-intermediate] [--force] [--workers=N] [--chunk-size=N]"
       exit 1
       ;;
   esac
@@ -64,6 +72,10 @@ echo "Installing dependencies ..."
 CMD="python $PARSER_DIR/main_get_all.py"
 $COPY_FLAG && CMD="$CMD --should-copy"
 $PRINT_FLAG && CMD="$CMD --should-print"
+$EXPORT_FLAG && CMD="$CMD --export-intermediate"
+$FORCE_FLAG && CMD="$CMD --force"
+CMD="$CMD --workers $WORKERS"
+[ -n "$CHUNK_SIZE" ] && CMD="$CMD --chunk-size $CHUNK_SIZE"
 
 echo "Running command: $CMD"
 $CMD
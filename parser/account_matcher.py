@@ -0,0 +1,66 @@
+import re
+import pandas as pd
+from normalize_selector_columns import account_map
+
+
+def normalize_account_names(names: pd.Series) -> pd.Series:
+  return names.astype(str).str.replace(" ", "").str.lower()
+
+
+class UnmatchedAccountsError(ValueError):
+  """Raised when accounts cannot be found in descriptions of some transfers."""
+  def __init__(self, report: pd.DataFrame):
+    super().__init__(f"accounts could not be found in {len(report)} descriptions of transfers")
+    self._report = report
+
+  @property
+  def report(self) -> pd.DataFrame:
+    return self._report
+
+
+class AccountMatcher:
+  """Find accounts between which money was transferred based on descriptions like
+  `Przelew z mBank na Revolut`."""
+
+  def __init__(self, accounts: list[str]):
+    # accounts are in order of priority - it is used when more of them match at the same place
+    self._accounts = list(dict.fromkeys(name.replace(" ", "").lower() for name in accounts))
+    self._priority = {account: i for i, account in enumerate(self._accounts)}
+    self._pattern = re.compile("|".join(re.escape(account) for account in self._accounts))
+
+  @classmethod
+  def from_account_map(cls, accounts: dict[str, str]) -> "AccountMatcher":
+    return cls(list(accounts.values()))
+
+  def _get_from_to(self, matches: list[str]) -> tuple[str, str]:
+    if len(matches) == 0:
+      return "", ""
+
+    # `from` account is the first one in the description and `to` account is the one with the
+    # highest priority among those after it
+    from_account = matches[0]
+    to_account = min(matches[1:], key=self._priority.__getitem__, default="")
+    return from_account, to_account
+
+  def match(self, descriptions: pd.Series) -> pd.DataFrame:
+    """Return data frame (with the same index as `descriptions`) with normalized names of
+    `from_account` and `to_account` (empty when not found) and `matched` flag."""
+    found = normalize_account_names(descriptions).str.findall(self._pattern)
+    result = pd.DataFrame(
+      [self._get_from_to(matches) for matches in found],
+      columns=["from_account", "to_account"],
+      index=descriptions.index,
+    )
+    result["matched"] = (result["from_account"] != "") & (result["to_account"] != "")
+    return result
+
+  def get_unmatched_report(self, descriptions: pd.Series, matches: pd.DataFrame) -> pd.DataFrame:
+    unmatched = ~matches["matched"]
+    return pd.DataFrame({
+      "description": descriptions[unmatched],
+      "from_account": matches.loc[unmatched, "from_account"],
+      "to_account": matches.loc[unmatched, "to_account"],
+    })
+
+
+ACCOUNT_MATCHER = AccountMatcher.from_account_map(account_map)
@@ -0,0 +1,131 @@
+"""Benchmark of stages of `main_get_all` run on synthetic spreadsheets generated with
+`generate_legacy_sheets`. Results (time, rows per second and peak memory of each stage) are
+saved to a JSON file which can be used as a baseline for comparing changes in the parser."""
+import json
+import click
+import platform
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from generate_legacy_sheets import generate_legacy_sheets
+from instrumentation import Instrumentation
+from pipeline import run_pipeline
+
+
+# steps run for each sheet (sub-steps of the `sheets` stage) are summed up for all sheets
+SHEET_STEPS = ["read", "clean", "exchange_refs"]
+
+
+def get_rows_per_s(rows: int | None, wall_time: float) -> int | None:
+  return round(rows / wall_time) if rows and wall_time > 0 else None
+
+
+def get_benchmark_stages(records: list[dict]) -> list[dict]:
+  """Return time, rows per second and peak memory of stages from records of `Instrumentation`
+  of the pipeline - steps run for each sheet are summed up (time of them is the time of
+  processes in which they were run)."""
+  stages = []
+  for record in records:
+    stages.append({
+      "stage": record["stage"],
+      "rows": record["rows_out"] or 0,
+      "wall_s": record["wall_s"],
+      "rows_per_s": get_rows_per_s(record["rows_out"], record["wall_s"]),
+      "peak_rss_mb": record["peak_rss_mb"],
+    })
+    if record["stage"] != "sheets":
+      continue
+
+    sheet_steps = [step for sheet in record["substeps"] for step in sheet["substeps"]]
+    for name in SHEET_STEPS:
+      steps = [step for step in sheet_steps if step["stage"] == name]
+      if not steps:
+        continue
+      rows = sum(step["rows_out"] or 0 for step in steps)
+      wall_time = round(sum(step["wall_s"] for step in steps), 4)
+      stages.append({
+        "stage": f"sheets.{name}",
+        "rows": rows,
+        "wall_s": wall_time,
+        "rows_per_s": get_rows_per_s(rows, wall_time),
+        "peak_rss_mb": max(step["peak_rss_mb"] for step in steps),
+      })
+
+  return stages
+
+
+def run_benchmark(rows: int, data_dir: Path, workers: int = 1, seed: int = 0) -> dict:
+  generated = generate_legacy_sheets(data_dir, rows, seed)
+  # the same stages as in `main_get_all` are measured but intermediate results are not saved
+  instrumentation = Instrumentation()
+  run_pipeline(data_dir=data_dir, workers=workers, use_cache=False, instrumentation=instrumentation)
+  return {
+    "rows": rows,
+    "transactions": sum(generated.values()),
+    "total_wall_s": round(sum(record["wall_s"] for record in instrumentation.records), 4),
+    "peak_rss_mb": max(record["peak_rss_mb"] for record in instrumentation.records),
+    "stages": get_benchmark_stages(instrumentation.records),
+  }
+
+
+def print_benchmark(run: dict):
+  print('*' * 100)
+  print(f"{run['transactions']} transactions - {run['total_wall_s']} s")
+  for stage in run["stages"]:
+    print(
+      f"{stage['stage']:<20} {stage['wall_s']:>10.3f} s {stage['rows_per_s'] or 0:>12} rows/s"
+      f" {stage['peak_rss_mb']:>10.1f} MB"
+    )
+
+
+@click.command()
+@click.option(
+  "--rows",
+  type=click.IntRange(min=1_000, max=10_000_000),
+  multiple=True,
+  default=[10_000],
+  show_default=True,
+  help="Number of transactions in all generated spreadsheets (can be given more times)",
+)
+@click.option(
+  "--workers",
+  type=click.IntRange(min=1),
+  default=1,
+  show_default=True,
+  help="Number of processes used to parse spreadsheets in parallel",
+)
+@click.option("--seed", type=int, default=0, show_default=True, help="Seed of random values")
+@click.option(
+  "--output",
+  type=click.Path(dir_okay=False, path_type=Path),
+  default=Path("benchmark_baseline.json"),
+  show_default=True,
+  help="JSON file where results are saved",
+)
+def main(rows, workers, seed, output):
+  runs = []
+  for rows_count in rows:
+    # generated files are removed after each run
+    with tempfile.TemporaryDirectory(prefix="finance_benchmark_") as data_dir:
+      run = run_benchmark(rows_count, Path(data_dir), workers, seed)
+    print_benchmark(run)
+    runs.append(run)
+
+  report = {
+    "created_at": datetime.now().isoformat(timespec="seconds"),
+    "python": platform.python_version(),
+    "pandas": pd.__version__,
+    "numpy": np.__version__,
+    "platform": platform.platform(),
+    "workers": workers,
+    "seed": seed,
+    "runs": runs,
+  }
+  output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+  print(f"results saved in '{output}'")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,101 @@
+import json
+import hashlib
+from pathlib import Path
+
+
+PARSER_DIR = Path(__file__).resolve().parents[0]
+
+MANIFEST_FILE_NAME = "build_manifest.json"
+MANIFEST_VERSION = 1
+
+# when code of the stages run for each sheet (also of reading and saving sheets) changes then all
+# cached results are outdated
+SHEET_STAGES_SOURCES = [
+  "pipeline.py",
+  "parse_finance_data.py",
+  "normalize_selector_columns.py",
+  "calculate_exchage_refs.py",
+  "fixed_point.py",
+  "sheet_names.py",
+  "storage.py",
+]
+
+
+def hash_file(path: Path) -> str:
+  digest = hashlib.sha256()
+  with open(path, "rb") as f:
+    while chunk := f.read(1024 * 1024):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def hash_sources(file_names: list[str] = SHEET_STAGES_SOURCES) -> str:
+  digest = hashlib.sha256()
+  for file_name in file_names:
+    digest.update(hash_file(PARSER_DIR / file_name).encode())
+  return digest.hexdigest()
+
+
+class BuildManifest:
+  """Content hashes of inputs and outputs of the last run of the pipeline. It is used to find
+  out which sheets have to be processed again and which can be loaded from saved results."""
+
+  def __init__(self, path: Path, code_hash: str, sheets: dict = None, outputs: dict = None):
+    self._path = path
+    self._code_hash = code_hash
+    self._sheets: dict[str, dict] = sheets or {}
+    self._outputs: dict[str, str] = outputs or {}
+
+  @classmethod
+  def load(cls, path: Path) -> "BuildManifest":
+    code_hash = hash_sources()
+    try:
+      data = json.loads(path.read_text(encoding="utf-8"))
+    except (FileNotFoundError, json.JSONDecodeError):
+      return cls(path, code_hash)
+
+    if data.get("version") != MANIFEST_VERSION or data.get("code_hash") != code_hash:
+      return cls(path, code_hash)
+    return cls(path, code_hash, data.get("sheets"), data.get("outputs"))
+
+  def is_sheet_fresh(self, name: int | str, raw_hash: str, output_files: list[Path]) -> bool:
+    entry = self._sheets.get(str(name))
+    if entry is None or entry["raw_hash"] != raw_hash:
+      return False
+
+    # saved results could be changed or removed since the last run
+    return all(
+      file.exists() and entry["outputs"].get(file.name) == hash_file(file)
+      for file in output_files
+    )
+
+  def get_sheet_info(self, name: int | str) -> dict:
+    return self._sheets[str(name)].get("info", {})
+
+  def record_sheet(
+    self,
+    name: int | str,
+    raw_hash: str,
+    output_files: list[Path],
+    info: dict | None = None,
+  ):
+    self._sheets[str(name)] = {
+      "raw_hash": raw_hash,
+      "outputs": {file.name: hash_file(file) for file in output_files},
+      "info": info or {},
+    }
+
+  def record_outputs(self, output_files: list[Path]):
+    self._outputs = {
+      str(file.relative_to(self._path.parent)): hash_file(file) for file in output_files
+    }
+
+  def save(self):
+    self._path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+      "version": MANIFEST_VERSION,
+      "code_hash": self._code_hash,
+      "sheets": self._sheets,
+      "outputs": self._outputs,
+    }
+    self._path.write_text(json.dumps(data, indent=2), encoding="utf-8")
@@ -1,77 +1,128 @@
-from pathlib import Path
+import numpy as np
 import pandas as pd
-
-def calculate_single_file_exchange_refs(filename: str, should_print: bool = False):
-
-  DATA_DIR = Path(__file__).resolve().parents[0] / "data" / filename
-  EXPENSES_FILE = DATA_DIR / f"finance_expenses_{filename}.csv"
-  INCOMES_FILE = DATA_DIR / f"finance_incomes_{filename}.csv"
-
-  df_incomes = pd.read_csv(INCOMES_FILE)
-  df_expenses = pd.read_csv(EXPENSES_FILE)
-
-  # Two pointer logic
-  index_incomes, index_expenses, num_of_refs = 0, 0, 0
-
-  income_row = df_incomes.iloc[index_incomes]
-  expense_row = df_expenses.iloc[index_expenses]
-
-  while index_incomes < len(df_incomes) and index_expenses < len(df_expenses):
-
-    expense_row = df_expenses.iloc[index_expenses]
-    income_row = df_incomes.iloc[index_incomes]
-
-    idx_e = expense_row["idx"]
-    date_e = expense_row["date"]
-    exchange_rate_e = expense_row["exchange_rate"]
-    currencies_e = expense_row["currencies"]
-    currency_e = expense_row["currency"]
-    amount_e = expense_row["amount"]
-    category_e = expense_row["category"]
-
-    idx_i = income_row["idx"]
-    date_i = income_row["date"]
-    exchange_rate_i = income_row["exchange_rate"]
-    currencies_i = income_row["currencies"]
-    currency_i = income_row["currency"]
-    amount_i = income_row["amount"]
-    category_i = income_row["category"]
-
-    if (
-      date_i == date_e and
-      currencies_i == currencies_e and
-      exchange_rate_i == exchange_rate_e
-    ):
-      if (
-        (amount_e > amount_i and currencies_e != f"{currency_i}/{currency_e}") or
-        (amount_i > amount_e and currencies_e != f"{currency_e}/{currency_i}")
-      ):
-        raise Exception(f"wrong 'currencies' value in file '{filename}'")
-      
-      df_incomes.at[index_incomes, "calc_ref_idx"] = idx_e
-      df_expenses.at[index_expenses, "calc_ref_idx"] = idx_i 
-
-      index_expenses += 1
-      index_incomes += 1
-      num_of_refs += 1
-      continue
-
-    if (category_e != "exchange"):
-      index_expenses += 1
-    if (category_i != "exchange"):
-      index_incomes += 1
-
-
-  df_expenses.to_csv(EXPENSES_FILE, index=False, encoding="utf-8")
-  df_incomes.to_csv(INCOMES_FILE, index=False, encoding="utf-8")
+from pathlib import Path
+from sheet_names import FOREIGN_SHEET_NAMES, get_sheet_files
+from storage import DEFAULT_STORAGE_FORMAT, load_frame, save_frame
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+
+
+# both rows of a single currency exchange (expense and income) have the same values of those
+EXCHANGE_KEY = ["date", "currencies", "exchange_rate"]
+
+
+def get_exchange_rows(df: pd.DataFrame, first_position: int = 0) -> pd.DataFrame:
+  """Return rows of currency exchanges with their positions in the file (`df` can be just a
+  part of the file starting at `first_position`)."""
+  rows = df.loc[:, ["idx", "amount", "currency", "category", *EXCHANGE_KEY]]
+  rows["position"] = np.arange(first_position, first_position + len(df))
+  rows = rows[(rows["category"] == "exchange") & rows[EXCHANGE_KEY].notna().all(axis=1)]
+  return rows.drop(columns=["category"])
+
+
+def add_occurrence(rows: pd.DataFrame) -> pd.DataFrame:
+  # there can be more exchanges with the same key (e.g. the same day and rate) - such rows
+  # are paired in the order in which they are in the file
+  return rows.assign(occurrence=rows.groupby(EXCHANGE_KEY, sort=False, observed=True).cumcount())
+
+
+def pair_exchange_rows(
+  expenses: pd.DataFrame,
+  incomes: pd.DataFrame,
+  filename: str,
+) -> pd.DataFrame:
+  """Pair rows of exchanges (from `get_exchange_rows`) of all expenses and incomes of a file."""
+  pairs = add_occurrence(expenses).merge(
+    add_occurrence(incomes),
+    on=[*EXCHANGE_KEY, "occurrence"],
+    suffixes=("_e", "_i"),
+    sort=False,
+  )
+
+  amount_e, amount_i = pairs["amount_e"], pairs["amount_i"]
+  currency_e = pairs["currency_e"].astype(str)
+  currency_i = pairs["currency_i"].astype(str)
+  wrong_currencies = (
+    ((amount_e > amount_i) & (pairs["currencies"] != currency_i + "/" + currency_e)) |
+    ((amount_i > amount_e) & (pairs["currencies"] != currency_e + "/" + currency_i))
+  )
+  if wrong_currencies.any():
+    raise Exception(f"wrong 'currencies' value in file '{filename}'")
+
+  return pairs
+
+
+def set_exchange_refs(
+  df: pd.DataFrame,
+  positions: np.ndarray,
+  ref_idx: np.ndarray,
+  first_position: int = 0,
+):
+  """Set `calc_ref_idx` of rows at `positions` in the file to `ref_idx` - only positions within
+  `df` (part of the file starting at `first_position`) are used."""
+  refs = df["calc_ref_idx"].to_numpy(dtype=float, na_value=np.nan, copy=True)
+  in_df = (positions >= first_position) & (positions < first_position + len(df))
+  refs[positions[in_df] - first_position] = ref_idx[in_df]
+  df["calc_ref_idx"] = refs
+
+
+def add_exchange_refs(
+  df_expenses: pd.DataFrame,
+  df_incomes: pd.DataFrame,
+  filename: str,
+  should_print: bool = False,
+) -> int:
+  """Set `calc_ref_idx` of expenses and incomes which are two sides of the same currency
+  exchange to `idx` of each other. Return number of added references."""
+  expenses = get_exchange_rows(df_expenses)
+  incomes = get_exchange_rows(df_incomes)
+  pairs = pair_exchange_rows(expenses, incomes, filename)
+
+  set_exchange_refs(
+    df_expenses, pairs["position_e"].to_numpy(), pairs["idx_i"].to_numpy(dtype=float)
+  )
+  set_exchange_refs(
+    df_incomes, pairs["position_i"].to_numpy(), pairs["idx_e"].to_numpy(dtype=float)
+  )
+
+  if should_print:
+    unmatched_expenses = expenses[~expenses["position"].isin(pairs["position_e"])]
+    unmatched_incomes = incomes[~incomes["position"].isin(pairs["position_i"])]
+    if len(unmatched_expenses) > 0 or len(unmatched_incomes) > 0:
+      print(f"exchanges without the other side in file '{filename}':")
+      print("expenses", unmatched_expenses["idx"].tolist())
+      print("incomes", unmatched_incomes["idx"].tolist())
+
+  return len(pairs)
+
+
+def calculate_single_file_exchange_refs(
+  filename: str,
+  should_print: bool = False,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+):
+  _, EXPENSES_FILE, INCOMES_FILE = get_sheet_files(DATA_DIR, filename, storage_format)
+
+  df_incomes = load_frame(INCOMES_FILE)
+  df_expenses = load_frame(EXPENSES_FILE)
+
+  num_of_refs = add_exchange_refs(df_expenses, df_incomes, filename, should_print)
+
+  save_frame(df_expenses, EXPENSES_FILE)
+  save_frame(df_incomes, INCOMES_FILE)
 
   if (should_print):
     print(f"number of references added in file '{filename}':", num_of_refs)
 
 
-def calculate_exchange_refs(should_print=False):
-  calculate_single_file_exchange_refs("2015_2024_foreign", should_print)
-  calculate_single_file_exchange_refs("2025_foreign", should_print)
+def calculate_exchange_refs(
+  should_print=False,
+  names: list[str] = FOREIGN_SHEET_NAMES,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+):
+  for name in names:
+    calculate_single_file_exchange_refs(name, should_print, storage_format)
   print('calculating exchange refs done')
 
 
@@ -1,13 +1,18 @@
 import pandas as pd
 from pathlib import Path
+from typing import Iterable
+from concurrent.futures import ProcessPoolExecutor
+from sheet_names import get_sheet_files, get_sheet_names
+from storage import DEFAULT_STORAGE_FORMAT, SELECTOR_COLUMNS, load_columns, load_selector_columns
+from vocabulary import save_vocabulary
 
 
 DATA_DIR = Path(__file__).resolve().parents[0] / "data"
 
+SUMMARY_FILE_NAME = "files_summary.csv"
 
-def check_columns(df: pd.DataFrame, columns: list[str], file_path):
-  df_columns = list(df.columns)
 
+def check_columns(df_columns: list[str], columns: list[str], file_path):
   # check if columns in all files are the same
   if len(columns) == 0:
     columns = df_columns
@@ -16,7 +21,7 @@ def check_columns(df: pd.DataFrame, columns: list[str], file_path):
       "columns names and order should be the same in all parsed files",
       f"Problem with file: {file_path}"
     )
-  
+
   return columns
 
 
@@ -27,54 +32,128 @@ def get_values_for_selectors(df: pd.DataFrame, columns_values: dict[str, set[str
   return columns_values
 
 
-def save_to_file(column_name: str, values: set[str]):
-  file_path = DATA_DIR / "all" / "selector_values" / f"{column_name}_values.txt"
+def get_file_summary(file_name: str, rows: int, file_values: dict[str, set[str]]) -> dict:
+  return {
+    "file": file_name,
+    "rows": rows,
+    **{column_name: len(values) for column_name, values in file_values.items()},
+  }
+
+
+def save_to_file(column_name: str, values: set[str], data_dir: Path = DATA_DIR):
+  file_path = data_dir / "all" / "selector_values" / f"{column_name}_values.txt"
 
   # when the path does not exist then it is created
   file_path.parent.mkdir(parents=True, exist_ok=True)
 
+  # values are sorted so the file is the same in each run for the same data
   with open(file_path, "w", encoding="utf-8") as f:
-    for value in values:
+    for value in sorted(values):
       f.write(value + "\n")
 
 
-def check_parsed_files(should_print=False):
+def save_summary(summary: list[dict], data_dir: Path = DATA_DIR):
+  file_path = data_dir / "all" / "selector_values" / SUMMARY_FILE_NAME
+  file_path.parent.mkdir(parents=True, exist_ok=True)
+  pd.DataFrame(summary).to_csv(file_path, index=False, encoding="utf-8")
+
+
+def check_frames(
+  frames: Iterable[tuple[int | str, tuple[pd.DataFrame, pd.DataFrame]]],
+) -> tuple[dict[str, set[str]], list[dict]]:
+  """Check that all parsed sheets have the same columns and return values of selectors
+  together with a summary of number of distinct values of them in each file."""
   columns: list[str] = []
-  columns_values: dict[str, set[str]] = {
-    "currency": set(),
-    "category": set(),
-    "payment_method": set(),
-    "account": set(),
-    "currencies": set(),
-    "transaction_type": set(),
-  }
+  columns_values: dict[str, set[str]] = {column: set() for column in SELECTOR_COLUMNS}
+  summary: list[dict] = []
 
-  names: list[int | str] = list(range(2015,2026))
-  names.append("2015_2024_foreign")
-  names.append("2025_foreign")
+  for name, (df_expenses, df_incomes) in frames:
+    for prefix, df in [("finance_expenses", df_expenses), ("finance_incomes", df_incomes)]:
+      file_name = f"{prefix}_{name}"
+      columns = check_columns(list(df.columns), columns, file_name)
 
-  for name in names:
-    EXPENSES_FILE = DATA_DIR / f"{name}" / f"finance_expenses_{name}.csv"
-    INCOMES_FILE = DATA_DIR / f"{name}" / f"finance_incomes_{name}.csv"
-    df_expenses = pd.read_csv(EXPENSES_FILE)
-    df_incomes = pd.read_csv(INCOMES_FILE)
+      file_values = get_values_for_selectors(df, {column: set() for column in SELECTOR_COLUMNS})
+      summary.append(get_file_summary(file_name, len(df), file_values))
+      for column_name, values in file_values.items():
+        columns_values[column_name].update(values)
 
-    columns = check_columns(df_expenses, columns, EXPENSES_FILE)
-    columns = check_columns(df_incomes, columns, INCOMES_FILE)
+  return columns_values, summary
 
-    # if (should_print):
-    columns_values = get_values_for_selectors(df_expenses, columns_values)
-    columns_values = get_values_for_selectors(df_incomes, columns_values)
 
+def scan_selector_values(file_path: Path) -> tuple[int, dict[str, set[str]]]:
+  """Return number of rows and values of selectors in a single file - only selector columns
+  are loaded (as categorical ones so each value is parsed just once)."""
+  df = load_selector_columns(file_path)
+  file_values = {
+    column: set(df[column].cat.remove_unused_categories().cat.categories)
+    for column in SELECTOR_COLUMNS
+  }
+  return len(df), file_values
+
+
+def scan_parsed_files(
+  names: list[int | str],
+  data_dir: Path = DATA_DIR,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+  workers: int = 1,
+) -> tuple[dict[str, set[str]], list[dict]]:
+  """The same as `check_frames` but data frames are not loaded. At first only headers of all
+  files are checked and then selector columns of files are scanned (in parallel)."""
+  file_paths = [
+    file_path
+    for name in names
+    for file_path in get_sheet_files(data_dir, name, storage_format)[1:]
+  ]
+
+  columns: list[str] = []
+  for file_path in file_paths:
+    columns = check_columns(load_columns(file_path), columns, file_path.stem)
+
+  if workers > 1:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      results = list(executor.map(scan_selector_values, file_paths))
+  else:
+    results = list(map(scan_selector_values, file_paths))
+
+  columns_values: dict[str, set[str]] = {column: set() for column in SELECTOR_COLUMNS}
+  summary: list[dict] = []
+  for file_path, (rows, file_values) in zip(file_paths, results):
+    summary.append(get_file_summary(file_path.stem, rows, file_values))
+    for column_name, values in file_values.items():
+      columns_values[column_name].update(values)
+
+  return columns_values, summary
+
+
+def save_selector_values(
+  columns_values: dict[str, set[str]],
+  summary: list[dict],
+  should_print: bool = False,
+  data_dir: Path = DATA_DIR,
+):
   if (should_print):
     print('All good with column names')
   for column_name, values in columns_values.items():
-    save_to_file(column_name, values)
+    save_to_file(column_name, values, data_dir)
     if (should_print):
-      print(f"{column_name} - {values}")
+      print(f"{column_name} - {sorted(values)}")
+  save_summary(summary, data_dir)
+  # known and used values of selectors are shared with the API
+  save_vocabulary(columns_values, data_dir)
+
+
+def check_parsed_files(
+  should_print=False,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+  workers: int = 1,
+):
+  columns_values, summary = scan_parsed_files(
+    get_sheet_names(), DATA_DIR, storage_format, workers
+  )
+  save_selector_values(columns_values, summary, should_print)
 
   print("checking done")
 
 
 if __name__ == "__main__":
-  check_parsed_files()
\ No newline at end of file
+  check_parsed_files()
@@ -1,104 +1,133 @@
 import pandas as pd
 import numpy as np
 from pathlib import Path
-
-
-def combine_finance_data(should_print=False):
-  names: list[int | str] = list(range(2015,2026))
-  names.append("2015_2024_foreign")
-  names.append("2025_foreign")
-
-  frames_all = []
-  frames_expenses = []
-  frames_incomes = []
-
-
+from typing import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from sheet_names import get_sheet_names, load_parsed_sheets
+from storage import DEFAULT_STORAGE_FORMAT, get_storage_suffix, save_frame
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+
+
+def get_combined_files(
+  data_dir: Path = DATA_DIR,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+) -> tuple[Path, Path, Path]:
+  """Return paths of files with all transactions, all expenses and all incomes."""
+  all_dir = data_dir / "all"
+  suffix = get_storage_suffix(storage_format)
+  return (
+    all_dir / f"finance_all{suffix}",
+    all_dir / f"finance_expenses_all{suffix}",
+    all_dir / f"finance_incomes_all{suffix}",
+  )
+
+
+def combine_frames(
+  frames: Iterable[tuple[int | str, tuple[pd.DataFrame, pd.DataFrame]]],
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+  """Combine parsed sheets into data frames with all transactions, all expenses and all
+  incomes. Each transaction gets unique `source_index` and references are moved to it."""
   cn_idx = "idx"
   cn_calc_ref_idx = "calc_ref_idx"
   cn_source_index = "source_index"
   cn_source_ref_index = "source_ref_index"
 
+  # ------------------------------------------------------------------------------------------
+  # here is the logic with creating new column `source_index` and `source_ref_index`
+  # basically I am using a little "brute force logic" as I am just increasing the `idx`
+  # by the number of rows in the previous documents in the loop. As this is just operation
+  # for cleaning old data and new data will be added via UI with proper values then it works well
+  #
+  # sheets are concatenated just once (expenses and incomes of each sheet one after another) so
+  # only offsets of each part are collected here:
+  # - `idx` of each part is increased by the number of rows before it
+  #   ('idx' of first expenses stays the same)
+  # - in expenses reference to income is extended by the same number by which `idx` of incomes
+  #   of the same sheet is extended and vice versa
+  parts: list[pd.DataFrame] = []
+  offsets: list[int] = []
+  ref_offsets: list[int] = []
+
   # used for setting proper 'real_idx' - it will be used to set connections with real IDs from
   # database when many transactions are created based on the CSV file created with this function
   total_rows = 0
 
-  for name in names:
-    DATA_DIR = Path(__file__).resolve().parents[0] / "data" 
-    EXPENSES_FILE = DATA_DIR / f"{name}" / f"finance_expenses_{name}.csv"
-    INCOMES_FILE = DATA_DIR / f"{name}" / f"finance_incomes_{name}.csv"
-    df_expenses = pd.read_csv(EXPENSES_FILE)
-    df_incomes = pd.read_csv(INCOMES_FILE)
-
-    # ----------------------------------------------------------------------------------------
-    # here is the logic with creating new column `source_index` and `source_ref_index`
-    # basically I am using a little "brute force logic" as I am just increasing the `idx`
-    # by the number of rows in the previous documents in the loop. As this is just operation
-    # for cleaning old data and new data will be added via UI with proper values then it works well
+  for _, (df_expenses, df_incomes) in frames:
     len_expenses = len(df_expenses)
-    len_incomes = len(df_incomes)  
-
-    # index of each expense is increase by the number of total rows
-    # ('idx' of first expenses stays the same)
-
-    total_rows_expenses = total_rows
-
-    df_expenses[cn_source_index] = df_expenses[cn_idx] + total_rows_expenses
-
-    total_rows_incomes = total_rows + len_expenses
-
-    df_incomes[cn_source_index] = df_incomes[cn_idx] + total_rows_incomes
-
-    # Values for "source_index" are fine now I have to set values for "source_ref_index".
-    # So in expenses I extend reference to income by the same number by which I was extending
-    # idx for income and vice versa
-
-    df_expenses[cn_source_ref_index] = np.where(
-      (df_expenses[cn_calc_ref_idx].notna()) & (df_expenses[cn_calc_ref_idx] > 0),
-      df_expenses[cn_calc_ref_idx] + total_rows_incomes,
-      df_expenses[cn_calc_ref_idx]
-    )
-
-    df_incomes[cn_source_ref_index] = np.where(
-      (df_incomes[cn_calc_ref_idx].notna()) & (df_incomes[cn_calc_ref_idx] > 0),
-      df_incomes[cn_calc_ref_idx] + total_rows_expenses,
-      df_incomes[cn_calc_ref_idx]
-    )
-
-    total_rows = total_rows + len_expenses + len_incomes
-    # ----------------------------------------------------------------------------------------
-
-    # remove `idx` and `calc_ref_idx` columns as they are not meaningful
-    df_expenses.drop(columns=[cn_idx, cn_calc_ref_idx], inplace=True)
-    df_incomes.drop(columns=[cn_idx, cn_calc_ref_idx], inplace=True)
-
-    # move column "source_index" to the first position
-    expenses_cols = [cn_source_index] + [c for c in df_expenses.columns if c != cn_source_index]
-    incomes_cols = [cn_source_index] + [c for c in df_incomes.columns if c != cn_source_index]
-    df_expenses = df_expenses[expenses_cols]
-    df_incomes = df_incomes[incomes_cols]
-
-    frames_all.extend([df_expenses, df_incomes])
-    frames_expenses.append(df_expenses)
-    frames_incomes.append(df_incomes)
-
-  sort_by = cn_source_index
-
-  df_all = pd.concat(frames_all, ignore_index=True).sort_values(by=sort_by)
-  df_expenses_all = pd.concat(frames_expenses, ignore_index=True).sort_values(by=sort_by)
-  df_incomes_all = pd.concat(frames_incomes, ignore_index=True).sort_values(by=sort_by)
+    parts.extend([df_expenses, df_incomes])
+    offsets.extend([total_rows, total_rows + len_expenses])
+    ref_offsets.extend([total_rows + len_expenses, total_rows])
+    total_rows = total_rows + len_expenses + len(df_incomes)
+
+  lengths = [len(df) for df in parts]
+  df_all = pd.concat(parts, ignore_index=True)
+  del parts
+
+  # `idx` and `calc_ref_idx` columns are removed as they are not meaningful after combining
+  calc_ref_idx = df_all.pop(cn_calc_ref_idx)
+  # column "source_index" is on the first position
+  df_all.insert(0, cn_source_index, df_all.pop(cn_idx) + np.repeat(offsets, lengths))
+  df_all[cn_source_ref_index] = np.where(
+    calc_ref_idx.notna() & (calc_ref_idx > 0),
+    calc_ref_idx + np.repeat(ref_offsets, lengths),
+    calc_ref_idx,
+  )
+  del calc_ref_idx
+  # ------------------------------------------------------------------------------------------
+
+  # indexes usually are already in order so sorting (and copying of all data) is not needed
+  if not df_all[cn_source_index].is_monotonic_increasing:
+    df_all = df_all.sort_values(by=cn_source_index, kind="stable", ignore_index=True)
+
+  # expenses and incomes keep the order of all transactions
+  is_expense = (df_all["transaction_type"] == "expense").to_numpy()
+  df_expenses_all = df_all[is_expense].reset_index(drop=True)
+  df_incomes_all = df_all[~is_expense].reset_index(drop=True)
+
+  return df_all, df_expenses_all, df_incomes_all
+
+
+def save_combined_frames(
+  df_all: pd.DataFrame,
+  df_expenses_all: pd.DataFrame,
+  df_incomes_all: pd.DataFrame,
+  data_dir: Path = DATA_DIR,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+):
+  ALL_TRANSACTIONS_FILE, ALL_EXPENSES_FILE, ALL_INCOMES_FILE = get_combined_files(
+    data_dir, storage_format
+  )
+
+  # writing is mostly done outside of Python (in pandas/pyarrow) so files are saved concurrently
+  with ThreadPoolExecutor(max_workers=3) as executor:
+    futures = [
+      executor.submit(save_frame, df_expenses_all, ALL_EXPENSES_FILE),
+      executor.submit(save_frame, df_incomes_all, ALL_INCOMES_FILE),
+      executor.submit(save_frame, df_all, ALL_TRANSACTIONS_FILE),
+    ]
+    for future in futures:
+      future.result()
+
+
+def print_combined_info(
+  df_all: pd.DataFrame,
+  df_expenses_all: pd.DataFrame,
+  df_incomes_all: pd.DataFrame,
+):
+  print("All expenses and incomes", len(df_all))
+  print("All expenses", len(df_expenses_all))
+  print("All incomes", len(df_incomes_all))
+
+
+def combine_finance_data(should_print=False, storage_format: str = DEFAULT_STORAGE_FORMAT):
+  combined = combine_frames(load_parsed_sheets(DATA_DIR, get_sheet_names(), storage_format))
 
   if should_print:
-    print("All expenses and incomes", len(df_all))
-    print("All expenses", len(df_expenses_all))
-    print("All incomes", len(df_incomes_all))
-
-  ALL_EXPENSES_FILE = DATA_DIR / "all" / "finance_expenses_all.csv"
-  ALL_INCOMES_FILE = DATA_DIR / "all" / "finance_incomes_all.csv"
-  ALL_TRANSACTIONS_FILE = DATA_DIR / "all" / "finance_all.csv"
+    print_combined_info(*combined)
 
-  df_expenses_all.to_csv(ALL_EXPENSES_FILE, index=False, encoding="utf-8")
-  df_incomes_all.to_csv(ALL_INCOMES_FILE, index=False, encoding="utf-8")
-  df_all.to_csv(ALL_TRANSACTIONS_FILE, index=False, encoding="utf-8")
+  save_combined_frames(*combined, storage_format=storage_format)
 
   print("combining data done")
 
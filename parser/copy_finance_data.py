@@ -1,37 +1,95 @@
-import subprocess
+import os
+import shutil
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from build_cache import hash_file
+from sheet_names import get_sheet_files, get_sheet_names
 
 
-def execute_copying(path_1: str, path_2: str, should_print: bool):
-  if should_print:
-    print('-' * len(str(path_2)))
-    print(path_1)
-    print(path_2)
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+SOURCE_DIR = Path("~/Downloads").expanduser()
+
+# copying is limited by the disk so threads are enough to do it concurrently
+COPY_WORKERS = 4
+
+
+def get_source_file(name: int | str, source_dir: Path = SOURCE_DIR) -> Path:
+  return source_dir / f"Finanse WZ - {name}.csv"
+
+
+def is_file_changed(path_1: Path, path_2: Path) -> bool:
+  """Check whether the copy (`path_2`) is different than the original file (`path_1`)."""
+  if not path_2.exists():
+    return True
+
+  stat_1, stat_2 = path_1.stat(), path_2.stat()
+  if stat_1.st_size != stat_2.st_size:
+    return True
+  # copies have the same modification time as originals so it is enough for unchanged files
+  if stat_1.st_mtime_ns == stat_2.st_mtime_ns:
+    return False
+
+  if hash_file(path_1) != hash_file(path_2):
+    return True
 
-  if path_1.exists():
-    # when the target path (path_2) does not exist then it is created
-    path_2.parent.mkdir(parents=True, exist_ok=True)
+  # the same content was saved again - time is updated to not compare content next time
+  os.utime(path_2, ns=(stat_2.st_atime_ns, stat_1.st_mtime_ns))
+  return False
 
-    if should_print:
-      print("copying")
-    subprocess.run(["cp", str(path_1), str(path_2)], check=True)
 
+def execute_copying(path_1: Path, path_2: Path) -> bool:
+  """Copy `path_1` to `path_2` if it exists and was changed. Return whether it was copied."""
+  if not path_1.exists() or not is_file_changed(path_1, path_2):
+    return False
 
-def copy_original_finance_spreadsheet(name: str, should_print: bool):
-  path_1 = Path(f"~/Downloads/Finanse WZ - {name}.csv").expanduser()
-  path_2 = Path(__file__).resolve().parents[0] / f"data/{name}/finance_raw_{name}.csv"
-  execute_copying(path_1, path_2, should_print)
+  # when the target path (path_2) does not exist then it is created
+  path_2.parent.mkdir(parents=True, exist_ok=True)
 
+  # file is copied under temporary name so the copy is never only partially written
+  tmp_path = path_2.with_name(f"{path_2.name}.tmp")
+  shutil.copy2(path_1, tmp_path)
+  os.replace(tmp_path, path_2)
+  return True
 
-def copy_finance_data(should_print: bool = False):
-  names: list[int | str] = list(range(2015,2026))
-  names.append("2015_2024_foreign")
-  names.append("2025_foreign")
 
-  for name in names:
-    copy_original_finance_spreadsheet(name, should_print)
+def copy_original_finance_spreadsheet(
+  name: int | str,
+  source_dir: Path = SOURCE_DIR,
+  data_dir: Path = DATA_DIR,
+) -> bool:
+  path_1 = get_source_file(name, source_dir)
+  path_2, _, _ = get_sheet_files(data_dir, name)
+  return execute_copying(path_1, path_2)
+
+
+def copy_finance_data(
+  should_print: bool = False,
+  names: list[int | str] | None = None,
+  source_dir: Path = SOURCE_DIR,
+  data_dir: Path = DATA_DIR,
+  workers: int = COPY_WORKERS,
+) -> set[int | str]:
+  """Copy spreadsheets exported from Excel which were changed since the last copying. Return
+  names of copied spreadsheets."""
+  names = get_sheet_names() if names is None else names
+
+  def copy_sheet(name: int | str) -> bool:
+    return copy_original_finance_spreadsheet(name, source_dir, data_dir)
+
+  with ThreadPoolExecutor(max_workers=workers) as executor:
+    copied = list(executor.map(copy_sheet, names))
+
+  if should_print:
+    for name, is_copied in zip(names, copied):
+      print('-' * 100)
+      print(get_source_file(name, source_dir))
+      print(get_sheet_files(data_dir, name)[0])
+      print("copied" if is_copied else "not changed")
+
+  changed_names = {name for name, is_copied in zip(names, copied) if is_copied}
+  print(f"copying done - changed sheets: {[name for name in names if name in changed_names]}")
+  return changed_names
 
-  print("copying done")
 
 if __name__ == "__main__":
-  copy_finance_data()
\ No newline at end of file
+  copy_finance_data()
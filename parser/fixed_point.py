@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+from decimal import Decimal, ROUND_HALF_EVEN
+
+
+# numbers with decimal places are kept as integers (number of the smallest units, e.g. amounts in
+# grosze/cents) so they are compared, grouped and sorted exactly and fast - they are converted
+# back to decimal numbers only when they are written to files
+FIXED_POINT_SCALES = {
+  "amount": 100,
+  "exchange_rate": 1_000_000,
+}
+
+# values of these columns with more decimal places than the scale allows are rounded (half to
+# even) instead of being rejected - e.g. a more precise exchange rate in an export should not stop
+# the parsing (amounts with fractions of grosze are always errors)
+ROUNDED_COLUMNS = {"exchange_rate"}
+
+
+def get_decimal_places(scale: int) -> int:
+  return len(str(scale)) - 1
+
+
+def get_inexact_values(values: pd.Series, scale: int) -> pd.Series:
+  """Return mask of values with more decimal places than can be kept with the given scale."""
+  return values.notna() & (np.round(values * scale) / scale != values)
+
+
+def round_to_scale(value: float, scale: int) -> int:
+  """Return number of the smallest units for the value rounded half to even (on its decimal
+  representation, so e.g. 1.0000005 is rounded down to 1.0 with scale 1_000_000)."""
+  return int((Decimal(repr(value)) * scale).quantize(Decimal(1), rounding=ROUND_HALF_EVEN))
+
+
+def to_fixed_point(values: pd.Series, scale: int, round_inexact: bool = False) -> pd.Series:
+  inexact = get_inexact_values(values, scale)
+  if inexact.any() and not round_inexact:
+    raise ValueError(
+      f"values in column '{values.name}' can have at most {get_decimal_places(scale)} decimal"
+      f" places - {values[inexact].tolist()}"
+    )
+  # nullable integers as some values (e.g. exchange rates) can be missing
+  result = np.round(values * scale).astype("Int64")
+  if inexact.any():
+    result[inexact] = [round_to_scale(value, scale) for value in values[inexact]]
+  return result
+
+
+def from_fixed_point(values: pd.Series, scale: int) -> pd.Series:
+  return pd.Series(
+    values.to_numpy(dtype=float, na_value=np.nan) / scale, index=values.index, name=values.name
+  )
+
+
+def to_fixed_point_columns(df: pd.DataFrame) -> pd.DataFrame:
+  """Return data frame with decimal numbers (e.g. loaded from a file) converted to integers."""
+  return df.assign(**{
+    column: to_fixed_point(df[column], scale)
+    for column, scale in FIXED_POINT_SCALES.items()
+    if column in df.columns and not pd.api.types.is_integer_dtype(df[column])
+  })
+
+
+def from_fixed_point_columns(df: pd.DataFrame) -> pd.DataFrame:
+  """Return data frame with integers converted back to decimal numbers (e.g. to save it)."""
+  return df.assign(**{
+    column: from_fixed_point(df[column], scale)
+    for column, scale in FIXED_POINT_SCALES.items()
+    if column in df.columns and pd.api.types.is_integer_dtype(df[column])
+  })
@@ -0,0 +1,315 @@
+"""Generator of synthetic spreadsheets in the same layout as the ones exported from Excel
+(`Finanse WZ - <name>.csv`) - they can be used for testing and benchmarking of the parser
+without the real data."""
+import csv
+import click
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from itertools import zip_longest
+
+from sheet_names import FOREIGN_SHEET_NAMES, get_sheet_files, get_sheet_names, get_sheet_year
+
+YEARLY_COLUMNS = [
+  "lp.", "d.", "m.", "nazwa", "wartość", "kategoria", "rodzaj operacji", "konto"
+]
+FOREIGN_COLUMNS = [
+  "lp.", "d.", "m.", "r.", "nazwa", "wartość", "waluta", "kategoria", "rodzaj operacji",
+  "konto", "kurs wymiany", "waluty"
+]
+# columns calculated in the spreadsheet next to the data - they are dropped by the parser
+SUMMARY_COLUMNS = ["Ilość transakcji", "ile w miesiącu"]
+
+EXPENSE_CATEGORIES = [
+  "Jedzenie", "Transport", "Ubrania", "Rozrywka", "Zdrowie", "Media", "Allegro", "Inne",
+  "Edukacja", "Elektronika", "Noclegi", "Sport", "Meble", "Bankomat", "Darowizna"
+]
+INCOME_CATEGORIES = ["Praca", "Zwrot", "Inne", "Wpłatomat", "Inwestycje"]
+EXPENSE_PAYMENT_METHODS = ["Karta", "BLIK", "Przelew", "Gotówka", "Opłata", "Bankomat"]
+INCOME_PAYMENT_METHODS = ["Uznanie", "Przelew", "Wpłatomat"]
+ACCOUNTS = [
+  "Pekao", "VeloBank", "Nest Bank", "Alior Bank", "Revolut", "mBank", "CardByCliq",
+  "Alior", "Gotówka", "Credit Agricole"
+]
+# accounts whose names can be found in descriptions of `Moje konto` transfers
+TRANSFER_ACCOUNTS = [
+  "Pekao", "VeloBank", "Nest Bank", "Alior Bank", "Revolut", "mBank", "CardByCliq",
+  "Credit Agricole"
+]
+FOREIGN_CURRENCIES = ["EUR", "GBP", "USD", "CZK", "HUF", "RON"]
+EXCHANGE_RATES = np.array([4.3, 5.0, 3.9, 0.17, 0.011, 0.87])
+DESCRIPTIONS = [
+  "Biedronka", "Lidl", "Orlen", "Jakdojade", "Allegro zakupy", "Apteka", "Netflix",
+  "Rossmann", "Bilet PKP", "Restauracja", "Kino", "Decathlon", "Prąd", "Internet"
+]
+
+# types of generated events - some of them produce both expense and income row
+EXPENSE, INCOME, TRANSFER, EXCHANGE = 0, 1, 2, 3
+
+
+def format_amount(cents: np.ndarray) -> list[str]:
+  # the same format as in Excel export - comma decimals and NBSP thousands separator
+  return [
+    f"{c // 100:,}".replace(",", "\xa0") + f",{c % 100:02d}"
+    for c in cents.tolist()
+  ]
+
+
+def format_rate(rates: np.ndarray) -> list[str]:
+  return [f"{r:.4f}".replace(".", ",") for r in rates.tolist()]
+
+
+def generate_events(
+  rng: np.random.Generator,
+  size: int,
+  first_day: np.datetime64,
+  days: int,
+  foreign: bool,
+) -> pd.DataFrame:
+  """Generate `size` events sorted by date. Each event describes one or two transactions."""
+  if foreign:
+    probabilities = [0.55, 0.15, 0.1, 0.2]
+  else:
+    probabilities = [0.65, 0.2, 0.15, 0.0]
+
+  kinds = rng.choice([EXPENSE, INCOME, TRANSFER, EXCHANGE], size=size, p=probabilities)
+  dates = first_day + np.sort(rng.integers(0, days, size=size)).astype("timedelta64[D]")
+
+  # transfers between own accounts sometimes use round amounts so there are groups with
+  # many transfers of the same amount which have to be paired by their descriptions
+  cents = rng.integers(100, 300_000, size=size)
+  round_amounts = rng.choice([5_000, 10_000, 20_000, 50_000, 100_000], size=size)
+  cents = np.where((kinds == TRANSFER) & (rng.random(size) < 0.2), round_amounts, cents)
+
+  return pd.DataFrame({
+    "kind": kinds,
+    "date": dates,
+    "cents": cents,
+    "currency": rng.integers(0, len(FOREIGN_CURRENCIES), size=size),
+    "foreign_side": rng.random(size) < 0.5,
+    "from_account": rng.integers(0, len(TRANSFER_ACCOUNTS), size=size),
+    "to_shift": rng.integers(1, len(TRANSFER_ACCOUNTS), size=size),
+    "bank_transfer": rng.random(size) < 0.7,
+    "description": rng.integers(0, len(DESCRIPTIONS), size=size),
+    "expense_category": rng.integers(0, len(EXPENSE_CATEGORIES), size=size),
+    "income_category": rng.integers(0, len(INCOME_CATEGORIES), size=size),
+    "expense_payment": rng.integers(0, len(EXPENSE_PAYMENT_METHODS), size=size),
+    "income_payment": rng.integers(0, len(INCOME_PAYMENT_METHODS), size=size),
+    "account": rng.integers(0, len(ACCOUNTS), size=size),
+  })
+
+
+def build_side(events: pd.DataFrame, is_expense: bool, foreign: bool) -> pd.DataFrame:
+  """Build rows of one side of the spreadsheet (expenses or incomes) from events."""
+  kinds = events["kind"].to_numpy()
+  own_kind = EXPENSE if is_expense else INCOME
+  events = events[(kinds == own_kind) | (kinds == TRANSFER) | (kinds == EXCHANGE)]
+  kinds = events["kind"].to_numpy()
+  n = len(events)
+
+  is_transfer = kinds == TRANSFER
+  is_exchange = kinds == EXCHANGE
+
+  from_names = np.array(TRANSFER_ACCOUNTS, dtype=object)[events["from_account"].to_numpy()]
+  to_idx = (events["from_account"].to_numpy() + events["to_shift"].to_numpy())
+  to_names = np.array(TRANSFER_ACCOUNTS, dtype=object)[to_idx % len(TRANSFER_ACCOUNTS)]
+  bank_transfer = events["bank_transfer"].to_numpy()
+
+  categories = np.array(EXPENSE_CATEGORIES if is_expense else INCOME_CATEGORIES, dtype=object)
+  categories = categories[events["expense_category" if is_expense else "income_category"]]
+  categories = np.where(is_transfer, "Moje konto", categories)
+  categories = np.where(is_exchange, "Wymiana", categories)
+
+  descriptions = np.array(DESCRIPTIONS, dtype=object)[events["description"].to_numpy()]
+  if is_expense:
+    transfer_descriptions = np.where(
+      bank_transfer, "Przelew z " + from_names + " na " + to_names, "Wpłata na " + to_names
+    )
+  else:
+    transfer_descriptions = np.where(
+      bank_transfer, "Przelew z " + from_names, "Wpłata z " + from_names
+    )
+  descriptions = np.where(is_transfer, transfer_descriptions, descriptions)
+  descriptions = np.where(is_exchange, "Wymiana walut", descriptions)
+
+  payment_methods = np.array(
+    EXPENSE_PAYMENT_METHODS if is_expense else INCOME_PAYMENT_METHODS, dtype=object
+  )[events["expense_payment" if is_expense else "income_payment"].to_numpy()]
+  payment_methods = np.where(is_transfer | is_exchange, "Przelew", payment_methods)
+
+  accounts = np.array(ACCOUNTS, dtype=object)[events["account"].to_numpy()]
+  accounts = np.where(is_transfer, from_names if is_expense else to_names, accounts)
+
+  cents = events["cents"].to_numpy()
+  dates = pd.DatetimeIndex(events["date"])
+
+  side = pd.DataFrame({
+    "lp.": np.arange(1, n + 1),
+    "d.": dates.day,
+    "m.": dates.month,
+  })
+  if foreign:
+    side["r."] = dates.year
+  side["nazwa"] = descriptions
+
+  if not foreign:
+    side["wartość"] = format_amount(cents)
+    side["kategoria"] = categories
+    side["rodzaj operacji"] = payment_methods
+    side["konto"] = accounts
+    return side
+
+  currency_idx = events["currency"].to_numpy()
+  currencies = np.array(FOREIGN_CURRENCIES, dtype=object)[currency_idx]
+  rates = EXCHANGE_RATES[currency_idx]
+
+  # for exchange the PLN side is calculated from the foreign one so both rows use the same rate
+  foreign_side = events["foreign_side"].to_numpy()
+  own_currency_is_foreign = foreign_side if is_expense else ~foreign_side
+  pln_cents = np.round(cents * rates).astype(np.int64)
+  amounts = np.where(is_exchange & ~own_currency_is_foreign, pln_cents, cents)
+  row_currencies = np.where(is_exchange & ~own_currency_is_foreign, "PLN", currencies)
+  row_currencies = np.where(is_transfer, "PLN", row_currencies)
+
+  # rate is always written as a value bigger than 1 together with the matching direction
+  exchange_rates = np.where(rates >= 1, rates, 1 / rates)
+  pairs = np.where(rates >= 1, currencies + "/PLN", "PLN/" + currencies)
+
+  # some foreign expenses are paid from PLN account so they have rate but are not exchange
+  card_conversion = (kinds == EXPENSE) & (events["foreign_side"].to_numpy())
+  has_rate = is_exchange | card_conversion
+
+  side["wartość"] = format_amount(amounts)
+  side["waluta"] = row_currencies
+  side["kategoria"] = categories
+  side["rodzaj operacji"] = payment_methods
+  side["konto"] = accounts
+  # card payments use bank's rate of the day which differs from the rate of own exchanges
+  jitter = 1 + (events["cents"].to_numpy() % 97 + 1) / 10_000
+  exchange_rates = np.where(card_conversion, exchange_rates * jitter, exchange_rates)
+  side["kurs wymiany"] = np.where(has_rate, format_rate(exchange_rates), "")
+  side["waluty"] = np.where(has_rate, pairs, "")
+  return side
+
+
+def generate_sheet(
+  path: Path,
+  rows: int,
+  year: int | None = None,
+  years: tuple[int, int] = (2015, 2024),
+  seed: int = 0,
+  chunk_size: int = 500_000,
+):
+  """Generate raw spreadsheet export with about `rows` transactions (expenses and incomes)."""
+  foreign = year is None
+  columns = FOREIGN_COLUMNS if foreign else YEARLY_COLUMNS
+  first_year, last_year = (year, year) if year is not None else years
+  first_day = np.datetime64(f"{first_year}-01-01")
+  days = int((np.datetime64(f"{last_year + 1}-01-01") - first_day).astype(int))
+
+  rng = np.random.default_rng(seed)
+  path.parent.mkdir(parents=True, exist_ok=True)
+  expenses_tmp = path.with_suffix(".expenses.tmp")
+  incomes_tmp = path.with_suffix(".incomes.tmp")
+
+  # events are generated in chunks of consecutive days, so the whole sheet is never in memory
+  # - each side is written to its own temporary file which are then merged side by side
+  n_chunks = max(1, -(-rows // chunk_size))
+  expense_lp, income_lp = 0, 0
+  with open(expenses_tmp, "w", encoding="utf-8", newline="") as f_expenses, \
+       open(incomes_tmp, "w", encoding="utf-8", newline="") as f_incomes:
+    for chunk in range(n_chunks):
+      # about 1.2 transaction per event because of transfers and exchanges
+      size = max(1, int(min(chunk_size, rows - chunk * chunk_size) / 1.2))
+      chunk_first_day = first_day + np.timedelta64(days * chunk // n_chunks, "D")
+      chunk_days = max(1, days * (chunk + 1) // n_chunks - days * chunk // n_chunks)
+      events = generate_events(rng, size, chunk_first_day, chunk_days, foreign)
+
+      expenses = build_side(events, True, foreign)
+      incomes = build_side(events, False, foreign)
+      expenses["lp."] += expense_lp
+      incomes["lp."] += income_lp
+      expense_lp += len(expenses)
+      income_lp += len(incomes)
+
+      expenses.to_csv(f_expenses, header=False, index=False)
+      incomes.to_csv(f_incomes, header=False, index=False)
+
+  empty_side = "," * (len(columns) - 1)
+  header = columns + [""] + columns + [""] + SUMMARY_COLUMNS
+  junk_rows = [
+    ["Finanse WZ"] + [""] * (len(header) - 1),
+    ["Wydatki"] + [""] * len(columns) + ["Przychody"] + [""] * (len(header) - len(columns) - 2),
+  ]
+
+  with open(path, "w", encoding="utf-8", newline="") as f_out, \
+       open(expenses_tmp, encoding="utf-8", newline="") as f_expenses, \
+       open(incomes_tmp, encoding="utf-8", newline="") as f_incomes:
+    writer = csv.writer(f_out)
+    writer.writerows(junk_rows)
+    writer.writerow(header)
+    for expense_line, income_line in zip_longest(f_expenses, f_incomes):
+      expense_line = expense_line.rstrip("\r\n") if expense_line else empty_side
+      income_line = income_line.rstrip("\r\n") if income_line else empty_side
+      f_out.write(f"{expense_line},,{income_line},,,\n")
+
+  expenses_tmp.unlink()
+  incomes_tmp.unlink()
+  return expense_lp + income_lp
+
+
+def get_sheet_years(name: int | str) -> tuple[int, int]:
+  # foreign spreadsheets have transactions of many years
+  if name == FOREIGN_SHEET_NAMES[0]:
+    return 2015, 2024
+  return 2025, 2025
+
+
+def generate_legacy_sheets(
+  data_dir: Path,
+  rows: int,
+  seed: int = 0,
+  names: list[int | str] | None = None,
+) -> dict[int | str, int]:
+  """Generate raw files of all spreadsheets (in the same places as copied ones) with about
+  `rows` transactions in total. Return numbers of generated transactions in each of them."""
+  names = get_sheet_names() if names is None else names
+  sheet_rows = max(1, rows // len(names))
+
+  generated = {}
+  for i, name in enumerate(names):
+    raw_file, _, _ = get_sheet_files(data_dir, name)
+    generated[name] = generate_sheet(
+      raw_file,
+      sheet_rows,
+      year=get_sheet_year(name),
+      years=get_sheet_years(name),
+      seed=seed + i,
+    )
+  return generated
+
+
+@click.command()
+@click.option(
+  "--data-dir",
+  type=click.Path(file_okay=False, path_type=Path),
+  required=True,
+  help="Directory where raw files are generated (it should not be the one with real data)",
+)
+@click.option(
+  "--rows",
+  type=click.IntRange(min=1_000, max=10_000_000),
+  default=10_000,
+  show_default=True,
+  help="Number of transactions in all spreadsheets",
+)
+@click.option("--seed", type=int, default=0, show_default=True, help="Seed of random values")
+def main(data_dir, rows, seed):
+  generated = generate_legacy_sheets(data_dir, rows, seed)
+  for name, count in generated.items():
+    print(f"{name}: {count} transactions")
+  print(f"generated {sum(generated.values())} transactions in '{data_dir}'")
+
+
+if __name__ == "__main__":
+  main()
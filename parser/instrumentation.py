@@ -0,0 +1,138 @@
+import os
+import sys
+import json
+import time
+import cProfile
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+
+def reset_peak_memory() -> bool:
+  # on Linux peak memory of the process (VmHWM) can be reset so it can be measured per stage
+  try:
+    Path("/proc/self/clear_refs").write_text("5")
+    return True
+  except OSError:
+    return False
+
+
+def get_peak_memory_mb() -> float:
+  """Return peak memory (RSS) in MB since the last `reset_peak_memory` - when it cannot be
+  reset then it is the peak of the whole process."""
+  try:
+    for line in Path("/proc/self/status").read_text().splitlines():
+      if line.startswith("VmHWM:"):
+        return int(line.split()[1]) / 1024
+  except OSError:
+    pass
+
+  import resource
+  max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # it is in bytes on macOS and in kilobytes on Linux
+  return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+def get_cpu_time() -> float:
+  # time of finished child processes (e.g. workers parsing sheets) is counted as well
+  times = os.times()
+  return times.user + times.system + times.children_user + times.children_system
+
+
+class Instrumentation:
+  """Measurements (wall time, CPU time, peak memory and numbers of rows) of stages of the
+  pipeline. Stages can have sub-steps - records of them are kept in `substeps` of the stage.
+  With `profile_dir` each stage is also profiled with cProfile (sub-steps of a profiled stage
+  are part of its profile, as only one profiler can be active at the same time)."""
+
+  def __init__(self, profile_dir: Path | None = None, prefix: tuple[str, ...] = ()):
+    self._profile_dir = profile_dir
+    # names of stages in which this instance is used (e.g. in other process)
+    self._prefix = prefix
+    self._records: list[dict] = []
+    # records of currently measured stages with the highest peak memory of their sub-steps
+    self._stack: list[tuple[dict, list[float]]] = []
+    self._is_profiling = False
+
+  @property
+  def records(self) -> list[dict]:
+    return self._records
+
+  @property
+  def profile_dir(self) -> Path | None:
+    return self._profile_dir
+
+  def _get_profile_file(self, name: str) -> Path:
+    names = [*self._prefix, *(record["stage"] for record, _ in self._stack), name]
+    return self._profile_dir / f"{'.'.join(names)}.prof"
+
+  def add_records(self, records: list[dict]):
+    """Add records measured somewhere else (e.g. in worker process) to the current stage."""
+    if self._stack:
+      parent_record, parent_peak = self._stack[-1]
+      parent_record["substeps"].extend(records)
+      parent_peak[0] = max([parent_peak[0], *(record["peak_rss_mb"] for record in records)])
+    else:
+      self._records.extend(records)
+
+  @contextmanager
+  def stage(self, name: str, rows_in: int | None = None, profile: bool = True):
+    """Measure code run within the context. Number of rows returned by the stage can be set
+    in `rows_out` of the yielded record."""
+    record = {"stage": name, "rows_in": rows_in, "rows_out": None, "substeps": []}
+    if self._stack:
+      parent_record, parent_peak = self._stack[-1]
+      parent_record["substeps"].append(record)
+      # peak memory is reset for the sub-step so the one measured so far is kept for the parent
+      parent_peak[0] = max(parent_peak[0], get_peak_memory_mb())
+    else:
+      self._records.append(record)
+
+    profiler = None
+    if self._profile_dir is not None and profile and not self._is_profiling:
+      profiler = cProfile.Profile()
+      profile_file = self._get_profile_file(name)
+      self._is_profiling = True
+
+    peak = [0.0]
+    self._stack.append((record, peak))
+    reset_peak_memory()
+    start_wall, start_cpu = time.perf_counter(), get_cpu_time()
+    if profiler is not None:
+      profiler.enable()
+    try:
+      yield record
+    finally:
+      if profiler is not None:
+        profiler.disable()
+        self._is_profiling = False
+        self._profile_dir.mkdir(parents=True, exist_ok=True)
+        profiler.dump_stats(profile_file)
+        record["profile"] = str(profile_file)
+
+      record["wall_s"] = round(time.perf_counter() - start_wall, 4)
+      record["cpu_s"] = round(get_cpu_time() - start_cpu, 4)
+      record["peak_rss_mb"] = round(max(peak[0], get_peak_memory_mb()), 1)
+      self._stack.pop()
+      if self._stack:
+        parent_peak = self._stack[-1][1]
+        parent_peak[0] = max(parent_peak[0], record["peak_rss_mb"])
+
+  def save(self, path: Path, **info):
+    """Save run report with records of all stages (and any additional `info`) to JSON file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+      "created_at": datetime.now().isoformat(timespec="seconds"),
+      **info,
+      "stages": self._records,
+    }
+    path.write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+
+  def print_summary(self):
+    print('*' * 100)
+    print(f"{'stage':<20} {'wall [s]':>10} {'cpu [s]':>10} {'peak [MB]':>10} {'rows':>12}")
+    for record in self._records:
+      print(
+        f"{record['stage']:<20} {record['wall_s']:>10.3f} {record['cpu_s']:>10.3f}"
+        f" {record['peak_rss_mb']:>10.1f} {record['rows_out'] or 0:>12}"
+      )
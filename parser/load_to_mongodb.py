@@ -0,0 +1,331 @@
+"""Load the final CSV file (`finance_all_transfer_refs.csv`) straight into MongoDB without
+uploading it to the FastAPI server. The same configuration (`MONGO_URI` and `MONGO_DB` from
+environment or `.env` file), schema and services as in the server are used."""
+import sys
+import click
+import asyncio
+import pandas as pd
+from pathlib import Path
+from typing import Iterable, Iterator
+from itertools import repeat
+from datetime import datetime, timezone
+from bson import ObjectId
+from validate_transactions import is_validated
+
+FASTAPI_DIR = Path(__file__).resolve().parents[1] / "fastapi_finance"
+sys.path.append(str(FASTAPI_DIR))
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pydantic_core import ValidationError
+from app.core.config import settings
+from app.db.database import Database
+from app.schema.transaction import TransactionCreate
+from app.services.category_service import get_categories_map
+from app.services.transaction_service import (
+  delete_transactions_by_ids,
+  serialize_object_id_if_any,
+  update_transactions_counter,
+)
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+FINAL_FILE = DATA_DIR / "all" / "finance_all_transfer_refs.csv"
+
+DEFAULT_BATCH_SIZE = 5_000
+DEFAULT_CONCURRENCY = 4
+
+# columns with texts are always loaded as texts (like in the CSV import of the server)
+TEXT_COLUMNS = [
+  "description",
+  "currency",
+  "category",
+  "payment_method",
+  "account",
+  "currencies",
+  "transaction_type",
+]
+
+
+class InvalidTransactionsError(Exception):
+  def __init__(self, errors: list[dict]):
+    super().__init__(f"{len(errors)} invalid transactions found")
+    self.errors = errors
+
+
+def read_file_index(file_path: Path) -> tuple[dict[int, ObjectId], list[str]]:
+  """Return IDs for all transactions in the file (by their `source_index`) and names of used
+  categories. IDs are created here so references can be set while inserting transactions - also
+  when the referenced transaction is in one of the next batches. `source_index` has to be unique,
+  otherwise nothing can be loaded."""
+  df = pd.read_csv(file_path, usecols=["source_index", "category"])
+  if not df["source_index"].is_unique:
+    duplicated = df["source_index"].duplicated()
+    raise InvalidTransactionsError([
+      {
+        "row": row,
+        "error": [{
+          "type": "duplicate_source_index",
+          "loc": ("source_index",),
+          "msg": "Value of 'source_index' is not unique",
+          "input": source_index,
+        }],
+      }
+      for row, source_index in zip(
+        (df.index[duplicated] + 1).tolist(), df["source_index"][duplicated].tolist()
+      )
+    ])
+  ids = {int(source_index): ObjectId() for source_index in df["source_index"]}
+  return ids, sorted(df["category"].dropna().unique())
+
+
+def iter_file_batches(file_path: Path, batch_size: int) -> Iterator[pd.DataFrame]:
+  dtype = {column: str for column in TEXT_COLUMNS}
+  with pd.read_csv(file_path, chunksize=batch_size, dtype=dtype) as reader:
+    yield from reader
+
+
+def get_batch_rows(df: pd.DataFrame) -> list[dict]:
+  # empty values are passed as None in the same way as in the CSV import of the server
+  return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def prepare_documents(
+  df: pd.DataFrame,
+  owner_id: ObjectId,
+  ids: dict[int, ObjectId],
+  categories_map: dict[str, ObjectId],
+  first_row: int = 1,
+) -> tuple[list[dict], list[dict], list[dict]]:
+  """Validate transactions of a single batch and return documents to insert, validation errors
+  and errors of references which cannot be set (`first_row` is the number of the first row)."""
+  docs = []
+  errors = []
+  update_errors = []
+
+  for i, row in enumerate(get_batch_rows(df), start=first_row):
+    try:
+      doc = TransactionCreate(**row, ownerId=owner_id).model_dump(by_alias=True)
+    except ValidationError as e:
+      errors.append({ "row": i, "error": e.errors() })
+      continue
+
+    doc["_id"] = ids[doc["sourceIndex"]]
+    doc["categoryId"] = categories_map[doc.pop("category")]
+
+    ref = doc.get("sourceRefIndex")
+    if ref:
+      if ref in ids:
+        doc["refId"] = ids[ref]
+      else:
+        update_errors.append({
+          "sourceIndex": doc["sourceIndex"],
+          "error": f"Broken 'sourceRefIndex' - {ref}"
+        })
+    docs.append(doc)
+
+  return docs, errors, update_errors
+
+
+def prepare_trusted_documents(
+  df: pd.DataFrame,
+  owner_id: ObjectId,
+  ids: dict[int, ObjectId],
+  categories_map: dict[str, ObjectId],
+) -> tuple[list[dict], list[dict]]:
+  """The same as `prepare_documents` but for transactions which are already validated (see
+  `validate_transactions`) - documents are created from whole columns without the schema."""
+  now = datetime.now(timezone.utc)
+  source_ref_index = df["source_ref_index"].astype("Int64")
+  has_ref = source_ref_index.fillna(0) != 0
+  ref_ids = source_ref_index.map(ids).where(has_ref)
+
+  # keys are in the same order as in documents created with the schema
+  columns = {
+    # microseconds are converted to `datetime` objects (like dates parsed by the schema)
+    "date": pd.to_datetime(df["date"]).to_numpy("datetime64[us]").astype(object),
+    "description": df["description"],
+    "amount": df["amount"].astype(float),
+    "currency": df["currency"],
+    "paymentMethod": df["payment_method"],
+    "account": df["account"],
+    "exchangeRate": df["exchange_rate"].astype(float),
+    "currencies": df["currencies"],
+    "transactionType": df["transaction_type"],
+    "createdAt": repeat(now),
+    "updatedAt": repeat(now),
+    "ownerId": repeat(owner_id),
+    "sourceIndex": df["source_index"],
+    "sourceRefIndex": source_ref_index,
+    "_id": df["source_index"].map(ids),
+    "categoryId": df["category"].map(categories_map),
+    "refId": ref_ids,
+  }
+
+  update_errors = [
+    {"sourceIndex": source_index, "error": f"Broken 'sourceRefIndex' - {ref}"}
+    for source_index, ref in zip(
+      df["source_index"][has_ref & ref_ids.isna()], source_ref_index[has_ref & ref_ids.isna()]
+    )
+  ]
+
+  # documents are built from lists of Python values (missing ones are None) of each column
+  values = [
+    column.astype(object).where(column.notna(), None).tolist()
+    if isinstance(column, pd.Series) else column
+    for column in columns.values()
+  ]
+  docs = [dict(zip(columns, row)) for row in zip(*values)]
+  for doc in docs:
+    # `refId` is set only for transactions with reference
+    if doc["refId"] is None:
+      del doc["refId"]
+  return docs, update_errors
+
+
+async def insert_batches(
+  db: Database,
+  batches: Iterable[list[dict]],
+  concurrency: int = DEFAULT_CONCURRENCY,
+) -> int:
+  """Insert batches of documents with at most `concurrency` of them being inserted at the same
+  time (next batches are prepared meanwhile). Return number of inserted documents."""
+  inserted = 0
+  pending = set()
+
+  try:
+    for docs in batches:
+      if len(pending) >= concurrency:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        inserted += sum(len(task.result().inserted_ids) for task in done)
+      # order of transactions does not matter as all IDs are already set
+      pending.add(asyncio.create_task(db.transactions.insert_many(docs, ordered=False)))
+  except BaseException:
+    # started inserts are finished so nothing is inserted after the error is handled
+    await asyncio.gather(*pending, return_exceptions=True)
+    raise
+
+  for result in await asyncio.gather(*pending):
+    inserted += len(result.inserted_ids)
+  return inserted
+
+
+async def load_transactions(
+  db: Database,
+  owner_id: ObjectId,
+  file_path: Path = FINAL_FILE,
+  batch_size: int = DEFAULT_BATCH_SIZE,
+  concurrency: int = DEFAULT_CONCURRENCY,
+) -> dict:
+  """Load all transactions from the final CSV file for the given user. Like the CSV import of
+  the server it is all or nothing - when any transaction is invalid or cannot be inserted then
+  already inserted ones are removed."""
+  if (await db.users.find_one({"_id": owner_id})) is None:
+    raise click.ClickException(f"User with id: '{owner_id}' not found")
+
+  # do not allow importing transactions for a user who already has transactions
+  if (await db.transactions.find_one({ "ownerId": owner_id }, projection={ "_id": 1 })):
+    raise click.ClickException(
+      "Cannot import transactions for a user who already has some transactions"
+    )
+
+  ids, category_names = read_file_index(file_path)
+  categories_map = await get_categories_map(db, owner_id, category_names)
+  # file stamped by the parser does not have to be validated again
+  trusted = is_validated(file_path)
+
+  errors = []
+  update_errors = []
+
+  def iter_documents() -> Iterator[list[dict]]:
+    first_row = 1
+    for df in iter_file_batches(file_path, batch_size):
+      if trusted:
+        batch_errors = []
+        docs, batch_update_errors = prepare_trusted_documents(df, owner_id, ids, categories_map)
+      else:
+        docs, batch_errors, batch_update_errors = prepare_documents(
+          df, owner_id, ids, categories_map, first_row
+        )
+      first_row += len(df)
+      errors.extend(batch_errors)
+      update_errors.extend(batch_update_errors)
+      if errors:
+        raise InvalidTransactionsError(errors)
+      yield docs
+
+  try:
+    imported = await insert_batches(db, iter_documents(), concurrency)
+  except BaseException:
+    # only transactions of this load are removed (they have IDs created for the file)
+    await delete_transactions_by_ids(db, list(ids.values()), batch_size)
+    raise
+
+  await update_transactions_counter(db, owner_id)
+  return {
+    "imported": imported,
+    "skipped": 0,
+    "errors": [],
+    "updateErrors": update_errors,
+    "trusted": trusted,
+  }
+
+
+async def load_to_mongodb(
+  owner_id: ObjectId,
+  file_path: Path = FINAL_FILE,
+  batch_size: int = DEFAULT_BATCH_SIZE,
+  concurrency: int = DEFAULT_CONCURRENCY,
+) -> dict:
+  client = AsyncIOMotorClient(settings.MONGO_URI)
+  try:
+    db = Database(client[settings.MONGO_DB])
+    return await load_transactions(db, owner_id, file_path, batch_size, concurrency)
+  finally:
+    client.close()
+
+
+@click.command()
+@click.option("--owner-id", required=True, help="ID of the user who owns the transactions")
+@click.option(
+  "--file",
+  "file_path",
+  type=click.Path(exists=True, dir_okay=False, path_type=Path),
+  default=FINAL_FILE,
+  show_default=True,
+  help="CSV file with all transactions",
+)
+@click.option(
+  "--batch-size",
+  type=click.IntRange(min=1),
+  default=DEFAULT_BATCH_SIZE,
+  show_default=True,
+  help="Number of transactions inserted at once",
+)
+@click.option(
+  "--concurrency",
+  type=click.IntRange(min=1),
+  default=DEFAULT_CONCURRENCY,
+  show_default=True,
+  help="Number of batches inserted at the same time",
+)
+def main(owner_id, file_path, batch_size, concurrency):
+  if not ObjectId.is_valid(owner_id):
+    raise click.BadParameter(f"'{owner_id}' is not a valid ID", param_hint="--owner-id")
+
+  try:
+    result = asyncio.run(
+      load_to_mongodb(ObjectId(owner_id), file_path, batch_size, concurrency)
+    )
+  except InvalidTransactionsError as e:
+    for error in map(serialize_object_id_if_any, e.errors[:10]):
+      print(error)
+    raise click.ClickException(f"{e} - nothing was loaded")
+
+  print(f"imported {result['imported']} transactions"
+        f"{' (validated by the parser)' if result['trusted'] else ''}")
+  for update_error in result["updateErrors"]:
+    print(update_error)
+
+
+if __name__ == "__main__":
+  main()
@@ -1,28 +1,99 @@
 import click
+from pathlib import Path
 from copy_finance_data import copy_finance_data
-from parse_finance_data import parse_finance_data
-from check_parsed_files import check_parsed_files
-from combine_finance_data import combine_finance_data
-from calculate_exchage_refs import calculate_exchange_refs
-from add_transfer_references import add_transfer_references
+from instrumentation import Instrumentation
+from pipeline import run_pipeline
+from storage import DEFAULT_STORAGE_FORMAT, STORAGE_FORMATS
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+REPORT_FILE = DATA_DIR / "run_report.json"
+PROFILE_DIR = DATA_DIR / "profile"
 
 
 @click.command()
 @click.option("--should-copy", is_flag=True, help="Whether to update copies of the raw CSV files")
 @click.option("--should-print", is_flag=True, help="Whehter to print additional info")
-def main(should_copy, should_print):
+@click.option(
+  "--workers",
+  type=click.IntRange(min=1),
+  default=1,
+  show_default=True,
+  help="Number of processes used to parse spreadsheets in parallel",
+)
+@click.option(
+  "--export-intermediate",
+  is_flag=True,
+  help="Whether to save also results of intermediate stages to CSV files",
+)
+@click.option("--force", is_flag=True, help="Whether to process all sheets ignoring the cache")
+@click.option(
+  "--no-cache",
+  is_flag=True,
+  help="Whether to process all sheets without saving results of them for the next runs",
+)
+@click.option(
+  "--storage-format",
+  type=click.Choice(list(STORAGE_FORMATS)),
+  default=DEFAULT_STORAGE_FORMAT,
+  show_default=True,
+  help="Format of files with results of intermediate stages (the final file is always CSV)",
+)
+@click.option(
+  "--chunk-size",
+  type=click.IntRange(min=1),
+  default=None,
+  help="Number of rows of raw spreadsheets parsed at once (whole spreadsheets when not set)",
+)
+@click.option(
+  "--profile",
+  is_flag=True,
+  help=f"Whether to profile each stage with cProfile (results are saved in '{PROFILE_DIR}')",
+)
+def main(
+  should_copy,
+  should_print,
+  workers,
+  export_intermediate,
+  force,
+  no_cache,
+  storage_format,
+  chunk_size,
+  profile,
+):
   
   print('Start preparing files')
 
-  if should_copy:
-    copy_finance_data(should_print)
-  parse_finance_data(should_print)
-  calculate_exchange_refs(should_print)
-  check_parsed_files(should_print)
-  combine_finance_data(should_print)
-
-  add_transfer_references(should_print)
+  instrumentation = Instrumentation(PROFILE_DIR if profile else None)
+  try:
+    changed_names = None
+    if should_copy:
+      with instrumentation.stage("copy"):
+        changed_names = copy_finance_data(should_print)
+    run_pipeline(
+      should_print=should_print,
+      workers=workers,
+      export_intermediate=export_intermediate,
+      use_cache=not no_cache,
+      force=force,
+      storage_format=storage_format,
+      chunk_size=chunk_size,
+      changed_names=changed_names,
+      instrumentation=instrumentation,
+    )
+  finally:
+    # report is saved also when some stage fails so it is known which ones were done
+    instrumentation.save(
+      REPORT_FILE,
+      workers=workers,
+      storage_format=storage_format,
+      chunk_size=chunk_size,
+      use_cache=not no_cache,
+      force=force,
+    )
+    print(f"run report saved in '{REPORT_FILE}'")
 
+  instrumentation.print_summary()
   print('Files ready')
 
 if __name__ == "__main__":
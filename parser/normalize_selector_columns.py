@@ -63,9 +63,56 @@ payment_method_map = {
   "Karta": "card"
 }
 
+def get_categories(values) -> list[str]:
+  # the same value can be mapped from more keys (e.g. "Alior" and "Alior Bank")
+  return list(dict.fromkeys(values))
+
+
+# selector columns are kept as categorical ones with all possible values known in advance so
+# they have the same type in all sheets and any unknown value is found while parsing
+SELECTOR_DTYPES = {
+  "currency": pd.CategoricalDtype(get_categories(currency_map.keys())),
+  "category": pd.CategoricalDtype(get_categories(category_map.values())),
+  "payment_method": pd.CategoricalDtype(get_categories(payment_method_map.values())),
+  "account": pd.CategoricalDtype(get_categories(account_map.values())),
+  "currencies": pd.CategoricalDtype([
+    f"{currency_1}/{currency_2}"
+    for currency_1 in currency_map
+    for currency_2 in currency_map
+    if currency_1 != currency_2
+  ]),
+  "transaction_type": pd.CategoricalDtype(["expense", "income"]),
+}
+
+
+def check_known_values(values: pd.Series, known_values, map_name: str):
+  unknown = values.notna() & ~values.isin(known_values)
+  if unknown.any():
+    raise ValueError(
+      f"unknown values in column '{values.name}' - {sorted(values[unknown].unique())}, "
+      f"they have to be added to `{map_name}`"
+    )
+
+
+def to_selector_dtype(values: pd.Series, map_name: str) -> pd.Series:
+  dtype = SELECTOR_DTYPES[values.name]
+  check_known_values(values, dtype.categories, map_name)
+  return values.astype(dtype)
+
+
 def normalize_selector_columns(df: pd.DataFrame):
-  df["account"] = df["account"].map(account_map)
-  df["category"] = df["category"].map(category_map)
+  # values which are not in maps would be changed to NaN so they are checked at first
+  check_known_values(df["account"], account_map.keys(), "account_map")
+  check_known_values(df["category"], category_map.keys(), "category_map")
+  check_known_values(df["payment_method"], payment_method_map.keys(), "payment_method_map")
+
+  df["account"] = df["account"].map(account_map).astype(SELECTOR_DTYPES["account"])
+  df["category"] = df["category"].map(category_map).astype(SELECTOR_DTYPES["category"])
+  df["payment_method"] = (
+    df["payment_method"].map(payment_method_map).astype(SELECTOR_DTYPES["payment_method"])
+  )
   # keep the 'currency' column as it is now because those are standard codes
   # df["currency"] = df["currency"].map(currency_map)
-  df["payment_method"] = df["payment_method"].map(payment_method_map)
+  df["currency"] = to_selector_dtype(df["currency"], "currency_map")
+  df["currencies"] = to_selector_dtype(df["currencies"], "currency_map")
+  df["transaction_type"] = df["transaction_type"].astype(SELECTOR_DTYPES["transaction_type"])
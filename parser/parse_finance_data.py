@@ -1,48 +1,155 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from typing import Callable, Iterator
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 from normalize_selector_columns import normalize_selector_columns
-
-
-def get_full_date(df: pd.DataFrame, year: int = None):
-  
-  if year is None:
-    df["full_date"] = pd.to_datetime(
-      df.loc[:, ["r.", "m.", "d."]]
-        .rename(columns={"r.": "year", "m.": "month", "d.": "day"})
-    )
-  else:
-    df["full_date"] = pd.to_datetime(
-      df.assign(year=year ).loc[:, ["year", "m.", "d."]]
-        .rename(columns={"m.": "month", "d.": "day"})
+from fixed_point import (
+  FIXED_POINT_SCALES,
+  ROUNDED_COLUMNS,
+  get_decimal_places,
+  get_inexact_values,
+  to_fixed_point,
+)
+from sheet_names import get_sheet_files, get_sheet_names, get_sheet_year
+from storage import DEFAULT_STORAGE_FORMAT, FrameWriter, save_frame
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+
+
+# rows of the raw file before the first row with data (2 skipped rows and the header)
+RAW_FILE_HEADER_ROWS = 3
+
+# columns with numbers and whether they should be parsed as integers
+NUMBER_COLUMNS = {
+  "lp.": True,
+  "wartość": False,
+  "kurs_wymiany": False,
+  "ref_lp": True,
+}
+
+def get_raw_file_rows(index: pd.Index) -> list[int]:
+  """Convert index of a data frame loaded from the raw file to row numbers in that file."""
+  return (index + RAW_FILE_HEADER_ROWS + 1).tolist()
+
+def parse_number_column(column: pd.Series, to_int: bool) -> pd.Series:
+  values = column
+  if not pd.api.types.is_numeric_dtype(column):
+    values = pd.to_numeric(
+      column.astype("string")
+        .str.replace(r"[\xa0 ]", "", regex=True) # remove non-breaking and regular spaces
+        .str.replace(",", ".", regex=False),      # replace comma with dot
+      errors="coerce"
     )
 
-  df.drop(columns=["r.", "m.", "d."], inplace=True, errors="ignore")
-  columns = list(df.columns)
-  columns.remove("full_date")
-  columns.insert(1, "full_date")
-  df = df[columns]
+  invalid = values.isna() & column.notna()
+  if to_int:
+    invalid |= values.notna() & (values % 1 != 0)
+
+  if invalid.any():
+    cells = [
+      f"row {row}: {value!r}"
+      for row, value in zip(get_raw_file_rows(column.index[invalid]), column[invalid])
+    ]
+    raise ValueError(f"invalid numbers in column '{column.name}' - {', '.join(cells)}")
+
+  # nullable integers keep index columns as integers even when there are some NaN values
+  return values.astype("Int64") if to_int else values.astype(float)
+
+# columns with parts of date (year is only in spreadsheets which are not yearly ones)
+DATE_COLUMNS = ["r.", "m.", "d."]
+
+def format_date_part(value) -> str:
+  # numbers loaded from the raw file can be floats (e.g. 31.0) so they are shown as integers
+  if isinstance(value, float) and value.is_integer():
+    return str(int(value))
+  return str(value)
+
+def assemble_dates(
+  years: np.ndarray,
+  months: np.ndarray,
+  days: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+  """Return dates (NaT when any part is missing) built from years, months and days (floats with
+  NaN for missing values) together with a mask of parts which don't make a valid date."""
+  missing = np.isnan(years) | np.isnan(months) | np.isnan(days)
+  invalid = ~missing & (
+    (years % 1 != 0) | (months % 1 != 0) | (days % 1 != 0)
+    | (years <= pd.Timestamp.min.year) | (years >= pd.Timestamp.max.year)
+    | (months < 1) | (months > 12) | (days < 1)
+  )
+  # parts of missing and invalid dates are replaced so all of them can be converted safely
+  is_valid = ~missing & ~invalid
+  years = np.where(is_valid, years, 1970).astype(np.int64)
+  months = np.where(is_valid, months, 1).astype(np.int64)
+  days = np.where(is_valid, days, 1).astype(np.int64)
+
+  month_starts = ((years - 1970) * 12 + months - 1).astype("datetime64[M]")
+  first_days = month_starts.astype("datetime64[D]")
+  days_in_month = ((month_starts + 1).astype("datetime64[D]") - first_days).astype(np.int64)
+  invalid |= is_valid & (days > days_in_month)
+
+  dates = (first_days + (days - 1)).astype("datetime64[ns]")
+  dates[missing | invalid] = np.datetime64("NaT")
+  return dates, invalid
+
+def get_full_date(df: pd.DataFrame, year: int = None) -> pd.DataFrame:
+  """Replace columns with parts of date with `full_date` column on the second position."""
+  parts = {
+    column: pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+    for column in DATE_COLUMNS
+    if column in df.columns
+  }
+  if year is not None:
+    parts["r."] = np.full(len(df), year, dtype=float)
+
+  dates, invalid = assemble_dates(parts["r."], parts["m."], parts["d."])
+  # values which are not numbers at all are invalid as well
+  for column in DATE_COLUMNS:
+    if column in df.columns:
+      invalid |= np.isnan(parts[column]) & df[column].notna().to_numpy()
+
+  if invalid.any():
+    # dates are shown as they are in the spreadsheet (day.month.year)
+    raw_parts = [
+      df[column].to_numpy() if column in df.columns else parts[column]
+      for column in reversed(DATE_COLUMNS)
+    ]
+    cells = [
+      f"row {row}: " + ".".join(format_date_part(values[position]) for values in raw_parts)
+      for row, position in zip(get_raw_file_rows(df.index[invalid]), np.flatnonzero(invalid))
+    ]
+    raise ValueError(f"invalid dates - {', '.join(cells)}")
+
+  df.drop(columns=DATE_COLUMNS, inplace=True, errors="ignore")
+  df.insert(1, "full_date", dates)
   return df
 
-def parse_number(x: int | float | str, to_int: bool):
-  if pd.isna(x):
-    return x
-
-  if isinstance(x, str):
-    x = x.replace('\xa0', '') # remove non-breaking space
-    x = x.replace(' ', '')    # remove regular spaces
-    x = x.replace(',', '.')   # replace comma with dot
-
-  return int(x) if to_int else float(x) 
-
 def clean_numbers(df: pd.DataFrame):
-  df['lp.'] = df['lp.'].apply(lambda x: parse_number(x, True))
-  df['wartość'] = df['wartość'].apply(lambda x: parse_number(x, False))
-  try:
-    df['kurs_wymiany'] = df['kurs_wymiany'].apply(lambda x: parse_number(x, False))
-    # because there are some NaN values in this column the whole column is cast to 'float'
-    df['ref_lp'] = df['ref_lp'].apply(lambda x: parse_number(x, True))
-  except:
-    pass
+  for column, to_int in NUMBER_COLUMNS.items():
+    # `kurs_wymiany` and `ref_lp` are only in some of the spreadsheets
+    if column in df.columns:
+      df[column] = parse_number_column(df[column], to_int)
+
+def clean_fixed_point_numbers(df: pd.DataFrame):
+  # amounts and exchange rates are kept as integers (see `FIXED_POINT_SCALES`)
+  for column, scale in FIXED_POINT_SCALES.items():
+    inexact = get_inexact_values(df[column], scale)
+    if inexact.any():
+      cells = [
+        f"row {row}: {value!r}"
+        for row, value in zip(get_raw_file_rows(df.index[inexact]), df[column][inexact])
+      ]
+      message = (
+        f"more than {get_decimal_places(scale)} decimal places in column '{column}' - "
+        f"{', '.join(cells)}"
+      )
+      if column not in ROUNDED_COLUMNS:
+        raise ValueError(message)
+      print(f"Warning: {message} (values are rounded)")
+    df[column] = to_fixed_point(df[column], scale, round_inexact=column in ROUNDED_COLUMNS)
 
 def rename_columns(df: pd.DataFrame):
   df.rename(
@@ -63,11 +170,11 @@ def rename_columns(df: pd.DataFrame):
 
 def add_missing_columns(df: pd.DataFrame, transaction_type: str):
   if not "exchange_rate" in df.columns:
-    df["exchange_rate"] = pd.NA
+    df["exchange_rate"] = np.nan
   if not "currencies" in df.columns:
     df["currencies"] = pd.NA
   
-  df["calc_ref_idx"] = pd.NA
+  df["calc_ref_idx"] = np.nan
   df["transaction_type"] = transaction_type
 
 
@@ -86,23 +193,15 @@ def drop_unnecessary_columns(df: pd.DataFrame):
   )
 
 
-def print_info(year: str, df_expenses: pd.DataFrame, df_incomes: pd.DataFrame):
+def print_info(year: str, expenses_count: int, incomes_count: int):
   print('*'*100)
   print("Year:", year)
-  print(f"Loaded {len(df_expenses)} of expenses rows")
-  print(f"Loaded {len(df_incomes)} of incomes rows")
+  print(f"Loaded {expenses_count} of expenses rows")
+  print(f"Loaded {incomes_count} of incomes rows")
 
 
-def parse_finance_spreadsheet(
-  raw_file: Path,
-  expenses_file: Path,
-  incomes_file: Path,
-  year: int = None,
-  should_print: bool = False
-):
-  # load CSV (first 2 rows don't have meaningful data)
-  df = pd.read_csv(raw_file, skiprows=2)
-
+def clean_sheet(df: pd.DataFrame, year: int = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+  """Return cleaned data frames with expenses and incomes of (part of) raw spreadsheet."""
   drop_unnecessary_columns(df)
 
   # split data to expenses and incomes
@@ -135,6 +234,9 @@ def parse_finance_spreadsheet(
   add_missing_columns(df_expenses, "expense")
   add_missing_columns(df_incomes, "income")
 
+  clean_fixed_point_numbers(df_expenses)
+  clean_fixed_point_numbers(df_incomes)
+
   if year is not None:
     df_expenses.insert(loc=4, column="currency", value="PLN")
     df_incomes.insert(loc=4, column="currency", value="PLN")
@@ -143,27 +245,115 @@ def parse_finance_spreadsheet(
   normalize_selector_columns(df_expenses)
   normalize_selector_columns(df_incomes)
 
-  # save prepared data frames to separate CSV files
-  df_expenses.to_csv(expenses_file, index=False, encoding="utf-8")
-  df_incomes.to_csv(incomes_file, index=False, encoding="utf-8")
+  return df_expenses, df_incomes
+
+
+def read_raw_sheet(raw_file: Path) -> pd.DataFrame:
+  # load CSV (first 2 rows don't have meaningful data)
+  return pd.read_csv(raw_file, skiprows=2)
+
+
+def parse_sheet(raw_file: Path, year: int = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+  """Load raw spreadsheet and return cleaned data frames with expenses and incomes."""
+  return clean_sheet(read_raw_sheet(raw_file), year)
+
+
+def iter_sheet_chunks(
+  raw_file: Path,
+  year: int = None,
+  chunk_size: int = 100_000,
+) -> Iterator[tuple[pd.DataFrame, pd.DataFrame]]:
+  """Load raw spreadsheet in parts of `chunk_size` rows and yield cleaned data frames with
+  expenses and incomes of each part - only one part is kept in memory at the same time."""
+  # all values are loaded as text so types of columns don't depend on values in a single part
+  # (e.g. part without any decimal number) - numbers and dates are parsed while cleaning
+  with pd.read_csv(raw_file, skiprows=2, chunksize=chunk_size, dtype=str) as reader:
+    for df in reader:
+      yield clean_sheet(df, year)
+
+
+def parse_finance_spreadsheet(
+  raw_file: Path,
+  expenses_file: Path,
+  incomes_file: Path,
+  year: int = None,
+  should_print: bool = False,
+  chunk_size: int | None = None,
+) -> tuple[int, int]:
+  if chunk_size is not None:
+    expenses_count, incomes_count = stream_finance_spreadsheet(
+      raw_file, expenses_file, incomes_file, year, chunk_size
+    )
+  else:
+    df_expenses, df_incomes = parse_sheet(raw_file, year)
+    expenses_count, incomes_count = len(df_expenses), len(df_incomes)
+
+    # save prepared data frames to separate files (format depends on their extension)
+    save_frame(df_expenses, expenses_file)
+    save_frame(df_incomes, incomes_file)
+    del df_expenses, df_incomes
 
   if should_print:
-    print_info(year, df_expenses, df_incomes)
+    print_info(year, expenses_count, incomes_count)
 
+  return expenses_count, incomes_count
 
-def parse_finance_data(should_print= False):
-  names: list[int | str] = list(range(2015,2026))
-  names.append("2015_2024_foreign")
-  names.append("2025_foreign")
-  
-  for name in names:
-    DATA_DIR = Path(__file__).resolve().parents[0] / "data" / f"{name}"
-    RAW_FILE = DATA_DIR / f"finance_raw_{name}.csv"
-    EXPENSES_FILE = DATA_DIR / f"finance_expenses_{name}.csv"
-    INCOMES_FILE = DATA_DIR / f"finance_incomes_{name}.csv"
-
-    year = name if isinstance(name, int) else None
-    parse_finance_spreadsheet(RAW_FILE, EXPENSES_FILE, INCOMES_FILE, year, should_print)
+
+def stream_finance_spreadsheet(
+  raw_file: Path,
+  expenses_file: Path,
+  incomes_file: Path,
+  year: int = None,
+  chunk_size: int = 100_000,
+  update_chunk: Callable[[pd.DataFrame, pd.DataFrame, int, int], None] | None = None,
+) -> tuple[int, int]:
+  """Parse raw spreadsheet in parts of `chunk_size` rows appending each of them to the files
+  with expenses and incomes. `update_chunk(df_expenses, df_incomes, expenses_offset,
+  incomes_offset)` can change each part before it is saved (offsets are the numbers of rows
+  saved before it). Return numbers of saved expenses and incomes."""
+  with FrameWriter(expenses_file) as expenses_writer, FrameWriter(incomes_file) as incomes_writer:
+    for df_expenses, df_incomes in iter_sheet_chunks(raw_file, year, chunk_size):
+      if update_chunk is not None:
+        update_chunk(df_expenses, df_incomes, expenses_writer.rows, incomes_writer.rows)
+      expenses_writer.write(df_expenses)
+      incomes_writer.write(df_incomes)
+
+    return expenses_writer.rows, incomes_writer.rows
+
+
+def parse_single_sheet(
+  name: int | str,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+  chunk_size: int | None = None,
+) -> tuple[int, int]:
+  RAW_FILE, EXPENSES_FILE, INCOMES_FILE = get_sheet_files(DATA_DIR, name, storage_format)
+  return parse_finance_spreadsheet(
+    RAW_FILE, EXPENSES_FILE, INCOMES_FILE, get_sheet_year(name), chunk_size=chunk_size
+  )
+
+
+def parse_finance_data(
+  should_print= False,
+  workers: int = 1,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+  chunk_size: int | None = None,
+):
+  names = get_sheet_names()
+  parse_sheet_file = partial(
+    parse_single_sheet, storage_format=storage_format, chunk_size=chunk_size
+  )
+
+  if workers > 1:
+    # every spreadsheet is independent so each one can be parsed in a separate process;
+    # `map` returns results in the order of `names` so the printed info is always the same
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      results = list(executor.map(parse_sheet_file, names))
+  else:
+    results = map(parse_sheet_file, names)
+
+  for name, (expenses_count, incomes_count) in zip(names, results):
+    if should_print:
+      print_info(get_sheet_year(name), expenses_count, incomes_count)
 
   print("parsing done")
 
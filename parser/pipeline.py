@@ -0,0 +1,299 @@
+import pandas as pd
+from pathlib import Path
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from parse_finance_data import (
+  clean_sheet,
+  iter_sheet_chunks,
+  print_info,
+  read_raw_sheet,
+  stream_finance_spreadsheet,
+)
+from calculate_exchage_refs import (
+  add_exchange_refs,
+  get_exchange_rows,
+  pair_exchange_rows,
+  set_exchange_refs,
+)
+from check_parsed_files import check_frames, save_selector_values
+from combine_finance_data import combine_frames, print_combined_info, save_combined_frames
+from add_transfer_references import add_transfer_refs
+from build_cache import MANIFEST_FILE_NAME, BuildManifest, hash_file
+from fixed_point import from_fixed_point_columns
+from instrumentation import Instrumentation
+from validate_transactions import (
+  print_validation_errors,
+  remove_stamp,
+  save_validation_errors,
+  stamp_validated,
+  validate_transactions,
+)
+from sheet_names import get_sheet_files, get_sheet_names, get_sheet_year, load_parsed_sheets
+from storage import DEFAULT_STORAGE_FORMAT, save_frame
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+
+SheetFrames = tuple[pd.DataFrame, pd.DataFrame]
+
+
+def run_sheet_stages(
+  name: int | str,
+  data_dir: Path,
+  chunk_size: int | None = None,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+  profile_dir: Path | None = None,
+) -> tuple[SheetFrames | None, int | None, list[dict]]:
+  """Parse single spreadsheet and (for foreign ones) add references between both sides of
+  currency exchanges. Return expenses, incomes, number of added exchange references and
+  measurements of each step (records of `Instrumentation`, as it can be run in other process).
+  With `chunk_size` the results are saved part by part and no data frames are returned."""
+  instrumentation = Instrumentation(profile_dir, prefix=("sheets",))
+  with instrumentation.stage(str(name)) as sheet_record:
+    if chunk_size is not None:
+      num_of_refs, rows = stream_sheet_stages(
+        name, data_dir, chunk_size, storage_format, instrumentation
+      )
+      sheet_record["rows_out"] = rows
+      return None, num_of_refs, instrumentation.records
+
+    raw_file, _, _ = get_sheet_files(data_dir, name)
+    year = get_sheet_year(name)
+    with instrumentation.stage("read") as record:
+      df = read_raw_sheet(raw_file)
+      record["rows_out"] = len(df)
+
+    with instrumentation.stage("clean", rows_in=len(df)) as record:
+      df_expenses, df_incomes = clean_sheet(df, year)
+      rows = len(df_expenses) + len(df_incomes)
+      record["rows_out"] = rows
+    del df
+
+    num_of_refs = None
+    if year is None:
+      with instrumentation.stage("exchange_refs", rows_in=rows) as record:
+        num_of_refs = add_exchange_refs(df_expenses, df_incomes, str(name))
+        record["rows_out"] = rows
+    sheet_record["rows_out"] = rows
+
+  return (df_expenses, df_incomes), num_of_refs, instrumentation.records
+
+
+def stream_sheet_stages(
+  name: int | str,
+  data_dir: Path,
+  chunk_size: int,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+  instrumentation: Instrumentation | None = None,
+) -> tuple[int | None, int]:
+  """The same stages as in `run_sheet_stages` but the raw spreadsheet is processed in parts of
+  `chunk_size` rows which are saved one by one. Return number of added exchange references
+  and number of saved rows."""
+  instrumentation = Instrumentation() if instrumentation is None else instrumentation
+  raw_file, expenses_file, incomes_file = get_sheet_files(data_dir, name, storage_format)
+  expenses_file.parent.mkdir(parents=True, exist_ok=True)
+  year = get_sheet_year(name)
+  if year is not None:
+    with instrumentation.stage("stream") as record:
+      record["rows_out"] = sum(
+        stream_finance_spreadsheet(raw_file, expenses_file, incomes_file, year, chunk_size)
+      )
+    return None, record["rows_out"]
+
+  # both sides of an exchange can be in different parts so at first only rows of exchanges
+  # are collected from the whole spreadsheet and references are set while saving it
+  with instrumentation.stage("collect_exchanges") as record:
+    expenses_rows, incomes_rows = [], []
+    expenses_offset = incomes_offset = 0
+    for df_expenses, df_incomes in iter_sheet_chunks(raw_file, year, chunk_size):
+      expenses_rows.append(get_exchange_rows(df_expenses, expenses_offset))
+      incomes_rows.append(get_exchange_rows(df_incomes, incomes_offset))
+      expenses_offset += len(df_expenses)
+      incomes_offset += len(df_incomes)
+
+    pairs = pair_exchange_rows(pd.concat(expenses_rows), pd.concat(incomes_rows), str(name))
+    record["rows_out"] = len(pairs)
+
+  positions_e, idx_i = pairs["position_e"].to_numpy(), pairs["idx_i"].to_numpy(dtype=float)
+  positions_i, idx_e = pairs["position_i"].to_numpy(), pairs["idx_e"].to_numpy(dtype=float)
+
+  def update_chunk(df_expenses, df_incomes, expenses_offset, incomes_offset):
+    set_exchange_refs(df_expenses, positions_e, idx_i, expenses_offset)
+    set_exchange_refs(df_incomes, positions_i, idx_e, incomes_offset)
+
+  with instrumentation.stage("stream") as record:
+    record["rows_out"] = sum(stream_finance_spreadsheet(
+      raw_file, expenses_file, incomes_file, year, chunk_size, update_chunk
+    ))
+  return len(pairs), record["rows_out"]
+
+
+def save_sheet_frames(
+  name: int | str,
+  frames: SheetFrames,
+  data_dir: Path,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+):
+  _, expenses_file, incomes_file = get_sheet_files(data_dir, name, storage_format)
+  expenses_file.parent.mkdir(parents=True, exist_ok=True)
+  save_frame(frames[0], expenses_file)
+  save_frame(frames[1], incomes_file)
+
+
+def run_pipeline(
+  names: list[int | str] | None = None,
+  data_dir: Path = DATA_DIR,
+  workers: int = 1,
+  should_print: bool = False,
+  export_intermediate: bool = False,
+  use_cache: bool = True,
+  force: bool = False,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+  chunk_size: int | None = None,
+  changed_names: set[int | str] | None = None,
+  instrumentation: Instrumentation | None = None,
+) -> pd.DataFrame:
+  """Run all stages of preparing data from raw spreadsheets passing data frames between them
+  in memory. Only the final file with all transactions and files with values of selectors
+  are saved, unless `export_intermediate` is set - then results of all stages are saved
+  as well (the same files as when stages are run one by one).
+
+  With `use_cache` results of stages run for each sheet are saved next to the raw file and
+  content hashes of them are kept in the build manifest. In the next run only sheets whose raw
+  file (or code of the stages) changed are processed again - the rest is loaded from the saved
+  results. `force` ignores the manifest and processes all sheets. Sheets in `changed_names`
+  (e.g. the ones just copied) are processed again without checking the manifest.
+
+  Results of intermediate stages are saved in `storage_format` (typed columnar files by
+  default) - the final file with all transactions is always saved as CSV.
+
+  With `chunk_size` raw spreadsheets are parsed in parts of that many rows (to limit memory
+  used for big spreadsheets) and results of each sheet are always saved.
+
+  Time, memory and numbers of rows of each stage (and of steps run for each sheet) are
+  recorded in `instrumentation`.
+  """
+  names = get_sheet_names() if names is None else names
+  instrumentation = Instrumentation() if instrumentation is None else instrumentation
+  all_dir = data_dir / "all"
+  all_dir.mkdir(parents=True, exist_ok=True)
+
+  with instrumentation.stage("cache_check") as record:
+    manifest = BuildManifest.load(data_dir / MANIFEST_FILE_NAME)
+    raw_hashes = {name: hash_file(get_sheet_files(data_dir, name)[0]) for name in names}
+    changed_names = set() if changed_names is None else changed_names
+    cached_names = [
+      name for name in names
+      if use_cache and not force and name not in changed_names and manifest.is_sheet_fresh(
+        name, raw_hashes[name], list(get_sheet_files(data_dir, name, storage_format)[1:])
+      )
+    ]
+    names_to_run = [name for name in names if name not in cached_names]
+    record["cache_hits"] = len(cached_names)
+
+  # steps run for each sheet are profiled separately (in processes in which they are run)
+  with instrumentation.stage("sheets", profile=False) as sheets_record:
+    # stages which work on each spreadsheet separately
+    run_stages = partial(
+      run_sheet_stages,
+      data_dir=data_dir,
+      chunk_size=chunk_size,
+      storage_format=storage_format,
+      profile_dir=instrumentation.profile_dir,
+    )
+    if workers > 1 and len(names_to_run) > 1:
+      with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = dict(zip(names_to_run, executor.map(run_stages, names_to_run)))
+    else:
+      results = {name: run_stages(name) for name in names_to_run}
+    for name in names_to_run:
+      instrumentation.add_records(results[name][2])
+
+    with instrumentation.stage("load_cached") as record:
+      cached_frames = dict(load_parsed_sheets(data_dir, cached_names, storage_format))
+      record["rows_out"] = sum(len(df) for frames in cached_frames.values() for df in frames)
+
+    frames: dict[int | str, SheetFrames] = {}
+    with instrumentation.stage("save") as record:
+      for name in names:
+        if name in cached_frames:
+          sheet_frames = cached_frames.pop(name)
+          num_of_refs = manifest.get_sheet_info(name).get("num_of_refs")
+        else:
+          sheet_frames, num_of_refs, _ = results.pop(name)
+          if sheet_frames is None:
+            # streamed sheets are already saved part by part
+            _, sheet_frames = next(load_parsed_sheets(data_dir, [name], storage_format))
+          elif use_cache or export_intermediate:
+            save_sheet_frames(name, sheet_frames, data_dir, storage_format)
+          if use_cache:
+            output_files = list(get_sheet_files(data_dir, name, storage_format)[1:])
+            manifest.record_sheet(
+              name, raw_hashes[name], output_files, {"num_of_refs": num_of_refs}
+            )
+
+        frames[name] = sheet_frames
+        if should_print:
+          print_info(get_sheet_year(name), len(sheet_frames[0]), len(sheet_frames[1]))
+          if num_of_refs is not None:
+            print(f"number of references added in file '{name}':", num_of_refs)
+
+    rows = sum(len(df) for sheet_frames in frames.values() for df in sheet_frames)
+    record["rows_out"] = rows
+    sheets_record["rows_out"] = rows
+
+  print("parsing done")
+  print('calculating exchange refs done')
+  if use_cache:
+    print(f"cache hits: {cached_names}")
+    print(f"processed again: {names_to_run}")
+
+  with instrumentation.stage("check", rows_in=rows) as record:
+    columns_values, summary = check_frames(frames.items())
+    save_selector_values(columns_values, summary, should_print, data_dir)
+    record["rows_out"] = rows
+  print("checking done")
+
+  with instrumentation.stage("combine", rows_in=rows) as record:
+    combined = combine_frames(frames.items())
+    del frames
+    record["rows_out"] = len(combined[0])
+    if should_print:
+      print_combined_info(*combined)
+    if export_intermediate:
+      with instrumentation.stage("save", rows_in=len(combined[0])):
+        save_combined_frames(*combined, data_dir, storage_format)
+  print("combining data done")
+
+  with instrumentation.stage("transfer_refs", rows_in=len(combined[0])) as record:
+    debug_dir = all_dir if export_intermediate else None
+    df_all = add_transfer_refs(combined[0], should_print, debug_dir)
+    del combined
+    record["rows_out"] = len(df_all)
+
+  # the same rules as in the API are checked so errors are known before importing data
+  with instrumentation.stage("validate", rows_in=len(df_all)) as record:
+    validation_errors = validate_transactions(df_all)
+    errors_file = save_validation_errors(validation_errors, data_dir)
+    record["rows_out"] = len(df_all) - validation_errors["row"].nunique()
+
+  with instrumentation.stage("export", rows_in=len(df_all)) as record:
+    final_file = all_dir / "finance_all_transfer_refs.csv"
+    # amounts and exchange rates are decimal numbers again only in the final file
+    from_fixed_point_columns(df_all).to_csv(final_file, index=False, encoding="utf-8")
+    # only file without errors can be imported without validating each transaction again
+    if validation_errors.empty:
+      stamp_validated(final_file, len(df_all))
+    else:
+      remove_stamp(final_file)
+    record["rows_out"] = len(df_all)
+  print('references has been successfully added for `myAccount` transactions.')
+  print_validation_errors(validation_errors, errors_file, should_print)
+
+  if use_cache:
+    with instrumentation.stage("cache_save"):
+      selector_files = sorted((all_dir / "selector_values").glob("*"))
+      manifest.record_outputs([final_file, *selector_files])
+      manifest.save()
+
+  return df_all
@@ -0,0 +1,45 @@
+import pandas as pd
+from pathlib import Path
+from typing import Iterator
+from storage import DEFAULT_STORAGE_FORMAT, get_storage_suffix, load_frame
+
+
+# names of copied spreadsheets - yearly ones have all transactions in PLN and foreign ones
+# have transactions in other currencies (together with exchanges between currencies)
+YEARLY_SHEET_NAMES: list[int] = list(range(2015, 2026))
+FOREIGN_SHEET_NAMES: list[str] = ["2015_2024_foreign", "2025_foreign"]
+
+
+def get_sheet_names() -> list[int | str]:
+  return [*YEARLY_SHEET_NAMES, *FOREIGN_SHEET_NAMES]
+
+
+def get_sheet_year(name: int | str) -> int | None:
+  # only yearly spreadsheets don't have a column with the year
+  return name if isinstance(name, int) else None
+
+
+def get_sheet_files(
+  data_dir: Path,
+  name: int | str,
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+) -> tuple[Path, Path, Path]:
+  """Return paths of the raw file and of the files with parsed expenses and incomes."""
+  sheet_dir = data_dir / f"{name}"
+  suffix = get_storage_suffix(storage_format)
+  return (
+    sheet_dir / f"finance_raw_{name}.csv",
+    sheet_dir / f"finance_expenses_{name}{suffix}",
+    sheet_dir / f"finance_incomes_{name}{suffix}",
+  )
+
+
+def load_parsed_sheets(
+  data_dir: Path,
+  names: list[int | str],
+  storage_format: str = DEFAULT_STORAGE_FORMAT,
+) -> Iterator[tuple[int | str, tuple[pd.DataFrame, pd.DataFrame]]]:
+  """Load parsed expenses and incomes of sheets one by one."""
+  for name in names:
+    _, expenses_file, incomes_file = get_sheet_files(data_dir, name, storage_format)
+    yield name, (load_frame(expenses_file), load_frame(incomes_file))
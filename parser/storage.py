@@ -0,0 +1,165 @@
+import pandas as pd
+from pathlib import Path
+from normalize_selector_columns import SELECTOR_DTYPES
+from fixed_point import from_fixed_point_columns, to_fixed_point_columns
+
+
+# formats of files with results of intermediate stages (name of the format -> extension) - the
+# final file with all transactions is always saved as CSV because it is imported by the API
+STORAGE_FORMATS = {
+  "csv": ".csv",
+  "parquet": ".parquet",
+  "feather": ".feather",
+}
+DEFAULT_STORAGE_FORMAT = "parquet"
+
+# columns with a limited set of values (chosen from selectors in the UI) - they are kept as
+# categorical ones so in columnar files each value is stored just once
+SELECTOR_COLUMNS = list(SELECTOR_DTYPES)
+
+
+def get_storage_suffix(storage_format: str) -> str:
+  if storage_format not in STORAGE_FORMATS:
+    raise ValueError(
+      f"unknown storage format '{storage_format}' - available ones: {list(STORAGE_FORMATS)}"
+    )
+  return STORAGE_FORMATS[storage_format]
+
+
+def get_storage_format(path: Path) -> str:
+  for storage_format, suffix in STORAGE_FORMATS.items():
+    if path.suffix == suffix:
+      return storage_format
+  raise ValueError(f"unknown storage format of file '{path}'")
+
+
+def get_selector_dtypes(df: pd.DataFrame) -> dict[str, pd.CategoricalDtype]:
+  return {column: dtype for column, dtype in SELECTOR_DTYPES.items() if column in df.columns}
+
+
+def to_storage_types(df: pd.DataFrame) -> pd.DataFrame:
+  # feather files can be saved only with the default index
+  return from_fixed_point_columns(df.astype(get_selector_dtypes(df))).reset_index(drop=True)
+
+
+def from_storage_types(df: pd.DataFrame) -> pd.DataFrame:
+  # frames loaded from files have the same categories of selector columns and the same integer
+  # amounts as the ones passed between stages without saving (CSV files don't have any
+  # categories at all)
+  return to_fixed_point_columns(df.astype(get_selector_dtypes(df)))
+
+
+def save_frame(df: pd.DataFrame, path: Path):
+  """Save data frame in the format matching extension of `path`."""
+  storage_format = get_storage_format(path)
+  if storage_format == "csv":
+    from_fixed_point_columns(df).to_csv(path, index=False, encoding="utf-8")
+  elif storage_format == "parquet":
+    to_storage_types(df).to_parquet(path, index=False)
+  else:
+    to_storage_types(df).to_feather(path)
+
+
+def load_frame(path: Path) -> pd.DataFrame:
+  """Load data frame saved with `save_frame`. Types of columns (dates, nullable integers) are
+  kept by columnar formats and in CSV files only `date` column has to be parsed again."""
+  storage_format = get_storage_format(path)
+  if storage_format == "csv":
+    return from_storage_types(pd.read_csv(path, parse_dates=["date"]))
+  elif storage_format == "parquet":
+    return from_storage_types(pd.read_parquet(path))
+  else:
+    return from_storage_types(pd.read_feather(path))
+
+
+def load_columns(path: Path) -> list[str]:
+  """Return names of columns without loading any data."""
+  storage_format = get_storage_format(path)
+  if storage_format == "csv":
+    return list(pd.read_csv(path, nrows=0).columns)
+
+  import pyarrow as pa
+  if storage_format == "parquet":
+    import pyarrow.parquet as pq
+    return pq.read_schema(path).names
+  with pa.memory_map(str(path)) as source:
+    return pa.ipc.open_file(source).schema.names
+
+
+def load_selector_columns(path: Path, columns: list[str] = SELECTOR_COLUMNS) -> pd.DataFrame:
+  """Load only selector columns as categorical ones (with categories found in the file)."""
+  storage_format = get_storage_format(path)
+  if storage_format == "csv":
+    df = pd.read_csv(path, usecols=columns, dtype="category")
+  elif storage_format == "parquet":
+    df = pd.read_parquet(path, columns=columns)
+  else:
+    df = pd.read_feather(path, columns=columns)
+  return df.astype({column: "category" for column in columns})
+
+
+class FrameWriter:
+  """Save data frame part by part (e.g. chunks of a big spreadsheet) to a single file in the
+  format matching extension of `path`."""
+
+  def __init__(self, path: Path):
+    self._path = path
+    self._storage_format = get_storage_format(path)
+    self._schema = None
+    self._writer = None
+    self._parts = 0
+    self._rows = 0
+
+  def __enter__(self) -> "FrameWriter":
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  @property
+  def rows(self) -> int:
+    return self._rows
+
+  def _get_schema(self, df: pd.DataFrame):
+    import pyarrow as pa
+
+    # columns without any value in the first part (e.g. `currencies` in yearly spreadsheets)
+    # don't have any type yet - they can only have text values
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(schema):
+      if pa.types.is_null(field.type):
+        schema = schema.set(i, field.with_type(pa.string()))
+    return schema
+
+  def _write_table(self, df: pd.DataFrame):
+    import pyarrow as pa
+
+    if self._schema is None:
+      self._schema = self._get_schema(df)
+      if self._storage_format == "parquet":
+        import pyarrow.parquet as pq
+        self._writer = pq.ParquetWriter(self._path, self._schema)
+      else:
+        self._writer = pa.ipc.new_file(self._path, self._schema)
+
+    self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+  def write(self, df: pd.DataFrame):
+    df = from_fixed_point_columns(df)
+    if self._storage_format == "csv":
+      df.to_csv(
+        self._path,
+        mode="w" if self._parts == 0 else "a",
+        header=self._parts == 0,
+        index=False,
+        encoding="utf-8",
+      )
+    else:
+      self._write_table(df)
+    self._parts += 1
+    self._rows += len(df)
+
+  def close(self):
+    if self._writer is not None:
+      self._writer.close()
+      self._writer = None
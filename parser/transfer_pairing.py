@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+from account_matcher import (
+  ACCOUNT_MATCHER,
+  AccountMatcher,
+  UnmatchedAccountsError,
+  normalize_account_names,
+)
+
+
+# transfers with this prefix can be in groups with many transfers of the same amount and then
+# the accounts from the description are needed to find out which expense matches which income
+TRANSFER_PREFIX = "Przelew z"
+
+# columns by which expenses are paired with incomes
+PAIR_KEY = ["amount", "by_description", "match_account", "rank"]
+
+
+def find_unbalanced_amounts(df: pd.DataFrame) -> list[int]:
+  """Return amounts (in ascending order, as integers like in `df`) for which the number of
+  expenses is different than the number of incomes."""
+  counts = (
+    df.groupby(["amount", "transaction_type"], observed=True)
+      .size()
+      .unstack(fill_value=0)
+      .reindex(columns=["expense", "income"], fill_value=0)
+  )
+  return counts.index[counts["expense"] != counts["income"]].tolist()
+
+
+def pair_transfers(df: pd.DataFrame, matcher: AccountMatcher = ACCOUNT_MATCHER) -> pd.Series:
+  """Pair expenses with incomes of transfers between own accounts.
+
+  `df` has to be sorted by `amount` and `date`. Transfers are grouped by amount. When a group
+  has just two rows they are paired together. In bigger groups the rows whose description
+  starts with `TRANSFER_PREFIX` are paired by the target account found in the description of
+  the expense (with the first not yet paired income of that account) and the rest of them are
+  paired in the order of dates.
+
+  Return mapping `source_index` -> `source_index` of the other side of the transfer (for both
+  expenses and incomes). When accounts cannot be found in some descriptions then
+  `UnmatchedAccountsError` with the report of them (indexed by `source_index`) is raised.
+  """
+  df = df[df["amount"].notna()]
+  is_expense = (df["transaction_type"] == "expense").to_numpy()
+
+  group_size = df.groupby("amount", sort=False)["amount"].transform("size").to_numpy()
+  by_description = (
+    (group_size != 2) & df["description"].str.startswith(TRANSFER_PREFIX, na=False).to_numpy()
+  )
+
+  # account which has to be the same for the expense and the income of the same transfer
+  match_account = np.full(len(df), "", dtype=object)
+  expenses_by_description = by_description & is_expense
+  incomes_by_description = by_description & ~is_expense
+  descriptions = pd.Series(
+    df["description"].to_numpy()[expenses_by_description],
+    index=pd.Index(df["source_index"].to_numpy()[expenses_by_description], name="source_index"),
+  )
+  matches = matcher.match(descriptions)
+  if not matches["matched"].all():
+    raise UnmatchedAccountsError(matcher.get_unmatched_report(descriptions, matches))
+
+  match_account[expenses_by_description] = matches["to_account"].to_numpy()
+  match_account[incomes_by_description] = (
+    normalize_account_names(df["account"]).to_numpy()[incomes_by_description]
+  )
+
+  rows = pd.DataFrame({
+    "amount": df["amount"].to_numpy(dtype=np.int64),
+    "by_description": by_description,
+    "match_account": match_account,
+    "is_expense": is_expense,
+    "source_index": df["source_index"].to_numpy(),
+  })
+
+  # rows paired by description have to be balanced on their own within the group
+  counts = (
+    rows[rows["by_description"]]
+      .groupby(["amount", "is_expense"])
+      .size()
+      .unstack(fill_value=0)
+      .reindex(columns=[False, True], fill_value=0)
+  )
+  if (counts[False] != counts[True]).any():
+    raise ValueError(
+      'there should be the same number of expenses and incomes within group (the same amount)'
+    )
+
+  # n-th expense is paired with n-th income with the same values of other columns in `PAIR_KEY`
+  rows["rank"] = (
+    rows.groupby(["amount", "by_description", "match_account", "is_expense"]).cumcount()
+  )
+
+  expenses = rows[rows["is_expense"]]
+  incomes = rows[~rows["is_expense"]]
+  pairs = expenses.merge(incomes, on=PAIR_KEY, how="left", suffixes=("_e", "_i"), sort=False)
+
+  not_paired = pairs["source_index_i"].isna()
+  if not_paired.any():
+    to_acc = pairs.loc[not_paired, "match_account"].iloc[0]
+    raise ValueError(f"No income found for account '{to_acc}'")
+
+  return pd.concat([
+    pd.Series(pairs["source_index_i"].to_numpy(), index=pairs["source_index_e"].to_numpy()),
+    pd.Series(pairs["source_index_e"].to_numpy(), index=pairs["source_index_i"].to_numpy()),
+  ]).astype(float)
@@ -0,0 +1,184 @@
+"""Validation of all transactions with the same rules as `TransactionCreate` schema of the FastAPI
+server, but done on whole columns. When there are no errors then the final file is stamped as
+validated so it can be loaded without validating each transaction again."""
+import json
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from build_cache import hash_file
+from vocabulary import VOCABULARY_COLUMNS, get_known_values, hash_known_values
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+FINAL_FILE = DATA_DIR / "all" / "finance_all_transfer_refs.csv"
+
+ERRORS_FILE_NAME = "validation_errors.csv"
+STAMP_SUFFIX = ".validated.json"
+# it has to be changed together with the rules below so older stamps are not trusted anymore
+RULES_VERSION = 2
+
+# columns which are required by the schema (all others are optional)
+REQUIRED_COLUMNS = [
+  "source_index",
+  "date",
+  "description",
+  "amount",
+  "currency",
+  "category",
+  "payment_method",
+  "account",
+  "transaction_type",
+]
+
+ERROR_COLUMNS = ["row", "source_index", "column", "error", "message"]
+
+
+def is_missing(values: pd.Series) -> pd.Series:
+  # empty texts are saved as empty cells so they are missing values after loading the file
+  return values.isna() | (values == "")
+
+
+def provided_together(df: pd.DataFrame, columns: list[str]) -> pd.Series:
+  """Return mask of rows where only some of the `columns` are provided."""
+  provided = pd.concat([~is_missing(df[column]) for column in columns], axis=1)
+  return provided.any(axis=1) & ~provided.all(axis=1)
+
+
+def get_rule_errors(df: pd.DataFrame) -> list[tuple[pd.Series, str, str, str]]:
+  """Return masks of invalid rows for each rule with the column, type and message of the error
+  (the same ones as in the schema)."""
+  is_exchange = df["category"] == "exchange"
+  rules = [
+    (is_missing(df[column]), column, "missing", "Field required")
+    for column in REQUIRED_COLUMNS
+  ]
+  # the same vocabulary is loaded by the server (`vocabulary.json`), so only known values pass
+  known_values = get_known_values()
+  rules.extend([
+    (
+      ~is_missing(df[column]) & ~df[column].isin(known_values[column]),
+      column,
+      "unknown_value",
+      f"Value is not known for '{column}'",
+    )
+    for column in VOCABULARY_COLUMNS
+  ])
+  rules.extend([
+    (
+      df["amount"] < 0,
+      "amount",
+      "amount_less_than_zero",
+      "Amount must be greater than zero",
+    ),
+    (
+      is_exchange & provided_together(df, ["currencies", "exchange_rate", "source_ref_index"]),
+      "currencies",
+      "exchange_group_incomplete",
+      "Values for 'currencies', 'exchange_rate' and 'source_ref_index' must be provided"
+      " together",
+    ),
+    (
+      ~is_exchange & provided_together(df, ["currencies", "exchange_rate"]),
+      "currencies",
+      "other_currency_group_incomplete",
+      "Values for 'currencies' and 'exchange_rate' must be provided together when any of them"
+      " is specified for foreign transaction",
+    ),
+  ])
+  return rules
+
+
+def validate_transactions(df: pd.DataFrame) -> pd.DataFrame:
+  """Return all errors of transactions in `df` - one row for each broken rule of a transaction.
+  `row` is the number of the transaction in the final CSV file (the same as in errors of the
+  CSV import of the server)."""
+  rows = pd.RangeIndex(1, len(df) + 1)
+  errors = [
+    pd.DataFrame({
+      "row": rows[invalid.to_numpy()],
+      "source_index": df["source_index"][invalid].to_numpy(),
+      "column": column,
+      "error": error,
+      "message": message,
+    })
+    for invalid, column, error, message in get_rule_errors(df)
+    if invalid.any()
+  ]
+  if not errors:
+    return pd.DataFrame(columns=ERROR_COLUMNS)
+  return pd.concat(errors, ignore_index=True).sort_values(by=["row", "column"], kind="stable")
+
+
+def get_stamp_file(file_path: Path) -> Path:
+  return file_path.with_name(file_path.name + STAMP_SUFFIX)
+
+
+def stamp_validated(file_path: Path, rows: int):
+  """Save hash of validated file so it can be trusted as long as it is not changed."""
+  stamp = {
+    "rules_version": RULES_VERSION,
+    "vocabulary_hash": hash_known_values(),
+    "file": file_path.name,
+    "sha256": hash_file(file_path),
+    "rows": rows,
+    "validated_at": datetime.now().isoformat(timespec="seconds"),
+  }
+  get_stamp_file(file_path).write_text(json.dumps(stamp, indent=2), encoding="utf-8")
+
+
+def remove_stamp(file_path: Path):
+  get_stamp_file(file_path).unlink(missing_ok=True)
+
+
+def is_validated(file_path: Path) -> bool:
+  """Check whether the file was validated with the current rules and not changed since then."""
+  try:
+    stamp = json.loads(get_stamp_file(file_path).read_text(encoding="utf-8"))
+  except (FileNotFoundError, json.JSONDecodeError):
+    return False
+  if stamp.get("rules_version") != RULES_VERSION:
+    return False
+  # values known when the file was validated could be changed since then
+  if stamp.get("vocabulary_hash") != hash_known_values():
+    return False
+  return stamp.get("sha256") == hash_file(file_path)
+
+
+def save_validation_errors(errors: pd.DataFrame, data_dir: Path = DATA_DIR) -> Path:
+  file_path = data_dir / "all" / ERRORS_FILE_NAME
+  file_path.parent.mkdir(parents=True, exist_ok=True)
+  errors.to_csv(file_path, index=False, encoding="utf-8")
+  return file_path
+
+
+def print_validation_errors(errors: pd.DataFrame, errors_file: Path, should_print: bool = False):
+  if errors.empty:
+    print("all transactions are valid")
+    return
+
+  print(f"{len(errors)} validation errors in {errors['row'].nunique()} transactions"
+        f" - all of them are saved in '{errors_file}'")
+  if should_print:
+    print(errors.groupby("error").size().to_string())
+
+
+def check_final_file(
+  should_print: bool = False,
+  file_path: Path = FINAL_FILE,
+  data_dir: Path = DATA_DIR,
+) -> bool:
+  """Validate the final file (e.g. changed manually) and stamp it when there are no errors."""
+  df = pd.read_csv(file_path)
+  errors = validate_transactions(df)
+  errors_file = save_validation_errors(errors, data_dir)
+  print_validation_errors(errors, errors_file, should_print)
+
+  if errors.empty:
+    stamp_validated(file_path, len(df))
+  else:
+    remove_stamp(file_path)
+  return errors.empty
+
+
+if __name__ == "__main__":
+  check_final_file(should_print=True)
@@ -0,0 +1,51 @@
+import json
+import hashlib
+from pathlib import Path
+from normalize_selector_columns import SELECTOR_DTYPES
+
+
+DATA_DIR = Path(__file__).resolve().parents[0] / "data"
+
+VOCABULARY_FILE_NAME = "vocabulary.json"
+# it has to be changed when the structure of the file changes (it is loaded also by the API)
+VOCABULARY_VERSION = 1
+
+# categories which are the same for all users (the rest of them are user categories)
+SYSTEM_CATEGORIES = ["exchange", "myAccount"]
+
+# columns whose values are validated against the vocabulary (by the parser and the server)
+VOCABULARY_COLUMNS = ["currency", "payment_method", "account", "currencies", "transaction_type"]
+
+
+def get_known_values() -> dict[str, list[str]]:
+  """Return all known values of selector columns (from maps used while parsing)."""
+  return {column: list(dtype.categories) for column, dtype in SELECTOR_DTYPES.items()}
+
+
+def hash_known_values() -> str:
+  return hashlib.sha256(json.dumps(get_known_values(), sort_keys=True).encode()).hexdigest()
+
+
+def build_vocabulary(columns_values: dict[str, set[str]]) -> dict:
+  """Return vocabulary of selector columns - all known values (from maps used while parsing)
+  and values used in parsed files (from `check_parsed_files`)."""
+  values = get_known_values()
+  used = {column: sorted(columns_values.get(column, set())) for column in values}
+  content = {
+    "values": values,
+    "used": used,
+    "system_categories": SYSTEM_CATEGORIES,
+  }
+  # hash of the content is the same for the same values so changes can be easily found
+  digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+  return {"version": VOCABULARY_VERSION, "hash": digest, **content}
+
+
+def save_vocabulary(columns_values: dict[str, set[str]], data_dir: Path = DATA_DIR) -> Path:
+  file_path = data_dir / "all" / VOCABULARY_FILE_NAME
+  file_path.parent.mkdir(parents=True, exist_ok=True)
+  vocabulary = build_vocabulary(columns_values)
+  file_path.write_text(
+    json.dumps(vocabulary, indent=2, ensure_ascii=False) + "\n", encoding="utf-8"
+  )
+  return file_path